@@ -1,10 +1,20 @@
 from django.urls import path
 
+from core.page_cache import cached_page
+
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path(
+        'author/',
+        cached_page(shared=True)(views.AboutAuthorView.as_view()),
+        name='author'
+    ),
+    path(
+        'tech/',
+        cached_page(shared=True)(views.AboutTechView.as_view()),
+        name='tech'
+    ),
 ]
@@ -0,0 +1,17 @@
+"""
+SQLite, у которого транзакции сразу берут блокировку записи.
+
+Django 2.2 открывает atomic() отложенным BEGIN: транзакция, которая
+сначала читает, а потом пишет (post_edit, приём картинки, ссылки
+ContentAddressedStorage, сдвиг рейтингов), в режиме WAL получает
+«database is locked» сразу, без ожидания busy_timeout, если кто-то
+успел записать после её чтения. BEGIN IMMEDIATE берёт блокировку
+записи в начале транзакции и ждёт её по busy_timeout; читатели вне
+транзакций под WAL её не ждут.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
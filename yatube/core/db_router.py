@@ -0,0 +1,104 @@
+"""
+Чтение с реплик, запись в основную базу.
+
+View, которые только читают, помечаются декоратором @replica_reads:
+пока такая view обрабатывает GET-запрос, ReplicaRouter отправляет
+чтения на случайную реплику из DATABASE_REPLICAS. Всё остальное —
+запись, транзакции, прочие view — идёт в default.
+
+Реплика отстаёт от основной базы, поэтому после успешного запроса,
+который писал в базу (POST с формой или GET вроде подписки — роутер
+замечает запись в db_for_write), посетителю ставится кука на
+REPLICA_PIN_SECONDS: пока она есть, его чтения идут в default и он
+сразу видит свои изменения. Время последней записи хранится и в кэше
+(recently_written): пока реплики могут отставать, кэш страниц не
+сохраняет отрендеренное по ним.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_COOKIE = 'pin_primary'
+LAST_WRITE_KEY = 'replica-last-write'
+
+_use_replica = ContextVar('use_replica', default=False)
+# Список, в который роутер отмечает записи текущего запроса.
+_request_writes = ContextVar('request_writes', default=None)
+
+
+def replica_reads(view_func):
+    """Помечает view, чьи GET-запросы можно читать с реплики."""
+    view_func.replica_reads = True
+    return view_func
+
+
+def reading_from_replica():
+    return _use_replica.get() and bool(settings.DATABASE_REPLICAS)
+
+
+def mark_write():
+    cache.set(LAST_WRITE_KEY, time.time(), settings.REPLICA_PIN_SECONDS)
+
+
+def recently_written():
+    """Была ли запись так недавно, что реплики могут её не содержать."""
+    return cache.get(LAST_WRITE_KEY) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes.append(model._meta.label)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в default.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = []
+        writes_token = _request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_writes.reset(writes_token)
+            token = getattr(request, 'replica_token', None)
+            if token is not None:
+                _use_replica.reset(token)
+        wrote = request.method == 'POST' or writes
+        if wrote and response.status_code < 400:
+            mark_write()
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            getattr(view_func, 'replica_reads', False)
+            and request.method in ('GET', 'HEAD')
+            and PIN_COOKIE not in request.COOKIES
+        ):
+            request.replica_token = _use_replica.set(True)
@@ -0,0 +1,60 @@
+"""
+Перекодирование загруженных картинок.
+
+Модуль не зависит от Django: reencode выполняется в пуле процессов
+(posts.images), куда передаются только байты и числа.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def check_pixels(size, max_pixels):
+    """Отсекает «бомбы»: маленький файл с огромным разрешением."""
+    width, height = size
+    if width * height > max_pixels:
+        raise ImageTooLarge(
+            f'Слишком большое разрешение: {width}×{height}'
+        )
+
+
+def flatten(image):
+    """Приводит картинку к RGB; прозрачность заливается белым."""
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def reencode(data, max_size, quality, max_pixels):
+    """
+    Уменьшает картинку до max_size по большей стороне, поворачивает по
+    EXIF и сохраняет в JPEG без метаданных (кроме цветового профиля).
+    Возвращает (байты JPEG, ширина, высота).
+    """
+    with Image.open(BytesIO(data)) as source:
+        # Заголовок уже прочитан, пиксели ещё нет.
+        check_pixels(source.size, max_pixels)
+        # JPEG декодируется сразу в уменьшенном в 2–8 раз виде.
+        source.draft('RGB', (max_size, max_size))
+        icc_profile = source.info.get('icc_profile')
+        image = flatten(ImageOps.exif_transpose(source))
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    output = BytesIO()
+    image.save(
+        output, 'JPEG',
+        quality=quality,
+        optimize=True,
+        progressive=True,
+        icc_profile=icc_profile,
+    )
+    return output.getvalue(), image.width, image.height
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в файлы реплик из DATABASE_REPLICAS. '
+        'Для локальной проверки чтения с реплик: запускать после миграций '
+        'и периодически, чтобы реплики догоняли основную базу.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплик нет: задайте число реплик в YATUBE_REPLICAS'
+            )
+        source = self.sqlite_path('default')
+        for alias in settings.DATABASE_REPLICAS:
+            target = self.sqlite_path(alias)
+            copy(source, target)
+            self.stdout.write(f'{alias}: {target}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено реплик: {len(settings.DATABASE_REPLICAS)}'
+        ))
+
+    @staticmethod
+    def sqlite_path(alias):
+        database = settings.DATABASES[alias]
+        if not database['ENGINE'].endswith('sqlite3'):
+            raise CommandError(f'{alias}: поддерживается только SQLite')
+        return database['NAME']
+
+
+def copy(source, target):
+    """
+    Снимок базы через backup API: он согласован, даже если в базу
+    в это время пишут. Файл реплики подменяется целиком, поэтому
+    читатели видят либо старый снимок, либо новый (соединение с
+    CONN_MAX_AGE — до своего переоткрытия).
+    """
+    temporary = f'{target}.tmp'
+    with sqlite3.connect(source) as src, sqlite3.connect(temporary) as dst:
+        src.backup(dst)
+        # Копия WAL-базы тоже в режиме WAL, а подменять файл, у которого
+        # рядом лежат -wal и -shm старой копии, нельзя.
+        dst.execute('PRAGMA journal_mode = delete')
+    src.close()
+    dst.close()
+    os.replace(temporary, target)
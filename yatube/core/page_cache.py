@@ -0,0 +1,191 @@
+"""
+Кэш целых страниц.
+
+View помечается декоратором @cached_page: такие страницы для анонимных
+посетителей отдаются из кэша ещё до вызова view, без единого запроса к
+БД. Ключ — адрес страницы с query string и общая версия, которую сигналы
+моделей поднимают при любом изменении данных (invalidate).
+
+Пользовательские фрагменты (шапка с именем и ссылками) выводятся тегом
+{% hole %}: в кэш страница попадает с «дыркой» на их месте, а при
+выдаче фрагменты рендерятся заново для текущего запроса. Поэтому
+страницы, помеченные @cached_page(shared=True), отдаются из кэша и
+вошедшим пользователям — у них вне дырок нет ничего личного.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .db_router import reading_from_replica, recently_written
+from .tiered_cache import new_version
+
+VERSION_KEY = 'page-cache-version'
+
+HOLE_PATTERN = re.compile(
+    r'<!--hole:([\w./-]+)-->.*?<!--/hole-->', re.DOTALL
+)
+
+ANONYMOUS = 'anonymous'
+SHARED = 'shared'
+
+VALIDATORS = ('ETag', 'Last-Modified')
+
+
+def cached_page(shared=False):
+    """
+    Кэширует страницу целиком: для анонимных посетителей, а при
+    shared=True — для всех, если личное выведено только через {% hole %}.
+    """
+    def decorator(view_func):
+        view_func.page_cache = SHARED if shared else ANONYMOUS
+        return view_func
+    return decorator
+
+
+def hole_markup(template_name, html):
+    return f'<!--hole:{template_name}-->{html}<!--/hole-->'
+
+
+def render_hole(template_name, request):
+    return render_to_string(template_name, request=request)
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, new_version(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Сбрасывает все закэшированные страницы."""
+    # Не incr: на файловом кэше он не атомарен (core.tiered_cache).
+    cache.set(VERSION_KEY, new_version(), None)
+
+
+def page_key(request):
+    url = request.build_absolute_uri()
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'page:{get_version()}:{digest}'
+
+
+def split_holes(content):
+    """
+    Режет страницу на куски текста и имена дырок: ('text', ...) и
+    ('hole', template_name).
+    """
+    segments = []
+    position = 0
+    for match in HOLE_PATTERN.finditer(content):
+        segments.append(('text', content[position:match.start()]))
+        segments.append(('hole', match.group(1)))
+        position = match.end()
+    segments.append(('text', content[position:]))
+    return segments
+
+
+def fill_holes(segments, request):
+    return ''.join(
+        hole_markup(value, render_hole(value, request))
+        if kind == 'hole' else value
+        for kind, value in segments
+    )
+
+
+def is_anonymous(request):
+    # Без сессионной куки посетитель точно аноним, и проверка не
+    # трогает ни сессию, ни пользователя в БД.
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+class PageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, 'page_cache_key', None)
+        if key is not None and self.is_cacheable(request, response):
+            self.store(key, request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        audience = getattr(view_func, 'page_cache', None)
+        if (
+            audience is None
+            or not settings.PAGE_CACHE_ENABLED
+            or request.method not in ('GET', 'HEAD')
+        ):
+            return None
+        anonymous = is_anonymous(request)
+        if audience == ANONYMOUS and not anonymous:
+            return None
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            if request.method == 'GET':
+                request.page_cache_key = key
+                request.page_cache_anonymous = anonymous
+            return None
+        return self.respond(request, entry, anonymous)
+
+    @staticmethod
+    def is_cacheable(request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not response.has_header('Cache-Control')
+            # Реплика могла ещё не получить недавнюю запись, а
+            # сохранённая страница пережила бы её invalidate().
+            and not (reading_from_replica() and recently_written())
+        )
+
+    @staticmethod
+    def store(key, request, response):
+        content = response.content.decode(response.charset)
+        # Валидаторы зависят от пользователя, поэтому сохраняются только
+        # со страниц, отрендеренных для анонима.
+        validators = {}
+        if request.page_cache_anonymous:
+            validators = {
+                name: response[name]
+                for name in VALIDATORS if response.has_header(name)
+            }
+        entry = {
+            'segments': split_holes(content),
+            'content_type': response['Content-Type'],
+            'validators': validators,
+        }
+        cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+
+    @staticmethod
+    def respond(request, entry, anonymous):
+        validators = entry['validators'] if anonymous else {}
+        if validators:
+            last_modified = validators.get('Last-Modified')
+            not_modified = get_conditional_response(
+                request,
+                etag=validators.get('ETag'),
+                last_modified=(
+                    last_modified and parse_http_date_safe(last_modified)
+                ),
+            )
+            if not_modified is not None:
+                return not_modified
+        response = HttpResponse(
+            fill_holes(entry['segments'], request),
+            content_type=entry['content_type'],
+        )
+        for name, value in validators.items():
+            response[name] = value
+        return response
@@ -0,0 +1,42 @@
+"""
+Настройка соединений SQLite для работы под нагрузкой.
+
+Каждое новое соединение (сигнал connection_created) получает PRAGMA из
+SQLITE_PRAGMAS. Главное — журнал WAL: читатели не ждут писателя, а
+писатель не ждёт читателей, так что страницы читаются, пока
+post_create или add_comment пишут. В режиме WAL synchronous=NORMAL
+не грозит целостности базы и убирает fsync с каждого коммита.
+Соединения живут CONN_MAX_AGE секунд, поэтому PRAGMA выполняются не
+на каждый запрос. Свои PRAGMA у базы можно задать ключом PRAGMAS в её
+записи DATABASES (так делает benchmark_sqlite).
+
+Транзакции основной базы начинаются с BEGIN IMMEDIATE (движок
+core.backends.sqlite3), чтобы запись после чтения ждала занятую базу
+по busy_timeout, а не падала сразу.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Эти PRAGMA меняют файл базы, а реплики (core.db_router) только
+# читают и подменяются целиком командой sync_replicas.
+FILE_PRAGMAS = ('journal_mode',)
+
+
+@receiver(connection_created)
+def configure(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    replica = connection.alias in settings.DATABASE_REPLICAS
+    pragmas = connection.settings_dict.get('PRAGMAS', settings.SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if replica and name in FILE_PRAGMAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def journal_mode(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0]
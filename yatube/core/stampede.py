@@ -0,0 +1,146 @@
+"""
+Кэш, устойчивый к «набегу» (cache stampede).
+
+Когда популярный ключ истекает, все воркеры разом промахиваются и
+одновременно идут в базу. get_or_compute защищается от этого тремя
+способами:
+
+* вероятностный ранний пересчёт (XFetch): чем ближе срок и чем дольше
+  считается значение, тем вероятнее, что один из запросов пересчитает
+  его заранее;
+* короткая блокировка через cache.add: пересчитывает один воркер;
+* stale-while-revalidate: пока ключ пересчитывается, остальные
+  получают старое значение, которое хранится дольше своего срока.
+
+Поверх get_or_compute сделаны тег {% fragment_cache %}
+(core.templatetags.fragment_cache) и декоратор view cache_view.
+"""
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import has_vary_header
+
+# Коэффициент раннего пересчёта: больше — пересчёт начинается раньше.
+BETA = 1.0
+# Сколько живёт блокировка пересчёта, если воркер упал, не сняв её.
+LOCK_TIMEOUT = 10
+# Сколько ждать чужого пересчёта, когда старого значения нет совсем.
+COLD_WAIT = 2
+POLL_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _compute_and_store(key, compute, timeout, stale_timeout):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    expiry = time.time() + timeout
+    cache.set(key, (value, delta, expiry), timeout + stale_timeout)
+    return value
+
+
+def _is_fresh(delta, expiry, beta):
+    # XFetch: -log(U) ~ Exp(1), поэтому запрос «видит» срок раньше
+    # на случайную величину, пропорциональную времени пересчёта.
+    jitter = -delta * beta * math.log(1 - random.random())
+    return time.time() + jitter < expiry
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=None, beta=BETA):
+    """
+    Значение из кэша или compute(), посчитанное одним воркером.
+
+    timeout — логический срок жизни значения, stale_timeout — сколько
+    после него старое значение ещё можно отдавать, пока идёт пересчёт
+    (по умолчанию столько же, сколько timeout).
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
+    lock_key = _lock_key(key)
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        if _is_fresh(delta, expiry, beta):
+            return value
+        if not cache.add(lock_key, True, LOCK_TIMEOUT):
+            return value
+    elif not cache.add(lock_key, True, LOCK_TIMEOUT):
+        # Старого значения нет, а пересчёт уже идёт: ждём его недолго,
+        # потом считаем сами, чтобы не держать запрос бесконечно.
+        deadline = time.monotonic() + COLD_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        return _compute_and_store(key, compute, timeout, stale_timeout)
+    try:
+        return _compute_and_store(key, compute, timeout, stale_timeout)
+    finally:
+        cache.delete(lock_key)
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def is_cacheable(request, response):
+    """
+    Можно ли отдать ответ другим запросам с тем же ключом. Куки и Vary
+    сессии и CSRF middleware добавят уже после view, поэтому ответ,
+    тронувший токен CSRF или сообщения, тоже считается личным.
+    """
+    messages = getattr(request, '_messages', None)
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not has_vary_header(response, 'Cookie')
+        and not request.META.get('CSRF_COOKIE_USED')
+        and not (messages is not None and messages.used)
+    )
+
+
+def cache_view(timeout, stale_timeout=None, version=None):
+    """
+    Кэширует ответы GET-запросов view через get_or_compute. Ключ —
+    адрес с query string, пользователь и version() — счётчик, который
+    меняется при изменении данных (например, page_cache.get_version).
+    Кэшируются только ответы 200 без кук и личного содержимого
+    (is_cacheable).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            raw = f'{request.build_absolute_uri()}|{request.user.pk}'
+            if version is not None:
+                raw = f'{raw}|{version()}'
+            key = 'view:{}:{}'.format(
+                view_func.__qualname__, hashlib.md5(raw.encode()).hexdigest()
+            )
+
+            def compute():
+                response = view_func(request, *args, **kwargs)
+                if callable(getattr(response, 'render', None)):
+                    response.render()
+                if not is_cacheable(request, response):
+                    raise _Uncacheable(response)
+                return response
+
+            try:
+                return get_or_compute(key, compute, timeout, stale_timeout)
+            except _Uncacheable as error:
+                return error.response
+        return wrapper
+    return decorator
@@ -0,0 +1,120 @@
+"""
+Хранилище файлов, адресуемых по содержимому.
+
+Имя файла — SHA-256 его содержимого: posts/ab/ab12…ef.jpg. Хеш
+считается по ходу записи загрузки во временный файл, за один проход,
+поэтому одинаковая картинка хранится один раз, сколько бы раз её ни
+загрузили, а миниатюры sorl-thumbnail, привязанные к имени исходника,
+общие у всех постов с этой картинкой.
+
+Каждый save() добавляет ссылку на файл, каждый delete() снимает одну
+(StoredFile.references); сам файл удаляется вместе с последней ссылкой,
+после чего отправляется сигнал file_deleted — по нему удаляется всё,
+что построено по файлу (миниатюры, posts.thumbnails).
+Файлы, которых нет в StoredFile (загруженные до этого хранилища),
+delete() не трогает — их переносит команда dedupe_media.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+file_deleted = Signal(providing_args=['name'])
+
+HASH_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(\.\w+)?$')
+
+
+def content_name(directory, digest, extension):
+    return posixpath.join(directory, digest[:2], digest + extension.lower())
+
+
+def is_content_name(name):
+    return HASH_NAME.search(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Окончательное имя выбирается в _save по содержимому; файл
+        # с таким именем — тот же самый файл, а не конфликт.
+        return name
+
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1]
+        temporary, digest, size = self._spool(content, directory)
+        name = content_name(directory, digest, extension)
+        try:
+            with transaction.atomic():
+                self._acquire(name, size)
+                path = self.path(name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temporary, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name
+
+    def _spool(self, content, directory):
+        """Пишет содержимое во временный файл и заодно считает хеш."""
+        root = self.path(directory)
+        os.makedirs(root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        handle, temporary = tempfile.mkstemp(dir=root, suffix='.upload')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return temporary, digest.hexdigest(), size
+
+    @staticmethod
+    def _acquire(name, size):
+        # Строка блокируется до конца транзакции: параллельный delete()
+        # последней ссылки не удалит файл, пока он нужен этому save().
+        row, _ = StoredFile.objects.select_for_update().get_or_create(
+            name=name, defaults={'size': size}
+        )
+        StoredFile.objects.filter(pk=row.pk).update(
+            references=F('references') + 1
+        )
+
+    def delete(self, name):
+        """Снимает ссылку на файл; удаляет его вместе с последней."""
+        with transaction.atomic():
+            row = (
+                StoredFile.objects.select_for_update()
+                .filter(name=name).first()
+            )
+            if row is None:
+                return
+            if row.references > 1:
+                StoredFile.objects.filter(pk=row.pk).update(
+                    references=F('references') - 1
+                )
+                return
+            row.delete()
+            super().delete(name)
+        file_deleted.send(sender=self.__class__, name=name)
+
+    def references(self, name):
+        return StoredFile.objects.filter(name=name).values_list(
+            'references', flat=True
+        ).first() or 0
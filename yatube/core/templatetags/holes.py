@@ -0,0 +1,18 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.page_cache import hole_markup, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name):
+    """
+    Вставляет пользовательский фрагмент, который кэш страниц рендерит
+    заново для каждого запроса. Фрагмент видит только request и
+    контекст-процессоры, а не контекст страницы: иначе закэшированная
+    и свежая версии могли бы разойтись.
+    """
+    html = render_hole(template_name, context.get('request'))
+    return mark_safe(hole_markup(template_name, html))
@@ -0,0 +1,32 @@
+from django import template
+
+register = template.Library()
+
+ELLIPSIS = '…'
+
+
+@register.filter
+def elided_page_range(page, on_each_side=2):
+    """
+    Номера страниц вокруг текущей, первая и последняя, а на месте
+    пропущенных — многоточие: ссылок столько же при любом числе страниц.
+    """
+    number = page.number
+    num_pages = page.paginator.num_pages
+    on_ends = 1
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > 1 + on_each_side + on_ends + 1:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
@@ -0,0 +1,17 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def url_replace(context, **params):
+    """
+    Query string текущего запроса с заменёнными параметрами;
+    параметр со значением None убирается.
+    """
+    query = context['request'].GET.copy()
+    for name, value in params.items():
+        query.pop(name, None)
+        if value is not None:
+            query[name] = str(value)
+    return '?' + query.urlencode()
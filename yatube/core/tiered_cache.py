@@ -0,0 +1,215 @@
+"""
+Двухуровневый кэш: LRU в памяти процесса поверх общего бэкенда.
+
+Каждый воркер держит у себя небольшой LRU (ограничен числом записей,
+объёмом в байтах и временем жизни), а все записи сквозь него уходят в
+общий кэш из settings.CACHES (файловый, memcached, redis), который
+видят все воркеры и машины. Горячие ключи — страницы лент, группы —
+читаются из памяти, холодные — из общего кэша.
+
+Согласованность держится на версиях. Кэш лент и страниц (feed_cache,
+page_cache) кладёт номер версии в ключи, поэтому сами фрагменты никогда
+не устаревают, а счётчики версий (SHARED_PREFIXES) в локальный уровень
+не попадают и всегда читаются из общего кэша: инвалидация в одном
+процессе сразу видна остальным. Новая версия — случайное значение
+(new_version), а не incr: у файлового кэша add и incr — это чтение и
+запись без блокировки, и две одновременные инвалидации через incr
+получили бы одну и ту же версию. Прочие ключи, удалённые или
+изменённые другим процессом, живут локально не дольше LOCAL_TIMEOUT. clear()
+меняет общее поколение, и остальные процессы сбрасывают свой LRU,
+сверившись с ним (не чаще раза в SYNC_INTERVAL секунд).
+
+Настройки в OPTIONS:
+
+* SHARED — имя общего бэкенда в CACHES;
+* MAX_ENTRIES, MAX_BYTES — пределы локального LRU;
+* LOCAL_TIMEOUT — сколько запись живёт в памяти процесса;
+* SYNC_INTERVAL — как часто сверять поколение с общим кэшем;
+* SHARED_PREFIXES — ключи, которые читаются только из общего кэша.
+"""
+import pickle
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+GENERATION_KEY = 'tiered-cache-generation'
+
+# Локальные уровни общие для всех потоков процесса: django.core.cache
+# создаёт экземпляр бэкенда на каждый поток.
+_stores = {}
+_stores_lock = Lock()
+
+
+def new_version():
+    """Значение счётчика версии, не совпадающее ни с одним прежним."""
+    return uuid.uuid4().hex
+
+
+class LocalStore:
+    """LRU с ограничением по числу записей, байтам и времени жизни."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.generation = None
+        self.synced_at = 0.0
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            pickled, expiry = entry
+            if expiry <= time.time():
+                self._delete(key)
+                return None
+            self.entries.move_to_end(key)
+            return pickled
+
+    def set(self, key, pickled, timeout):
+        with self.lock:
+            self._delete(key)
+            if timeout <= 0 or len(pickled) > self.max_bytes:
+                return
+            self.entries[key] = (pickled, time.time() + timeout)
+            self.size += len(pickled)
+            while (
+                len(self.entries) > self.max_entries
+                or self.size > self.max_bytes
+            ):
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def delete(self, key):
+        with self.lock:
+            self._delete(key)
+
+    def _delete(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options['SHARED']
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._shared_prefixes = tuple(options.get('SHARED_PREFIXES', ()))
+        with _stores_lock:
+            self._local = _stores.setdefault(name, LocalStore(
+                options.get('MAX_ENTRIES', 1000),
+                options.get('MAX_BYTES', 16 * 1024 * 1024),
+            ))
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_key(self, key, version):
+        if key.startswith(self._shared_prefixes):
+            return None
+        return self.make_key(key, version=version)
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _sync(self):
+        """Сбрасывает локальный уровень, если общий кэш очищали."""
+        local = self._local
+        now = time.monotonic()
+        if now - local.synced_at < self._sync_interval:
+            return
+        local.synced_at = now
+        generation = self.shared.get(GENERATION_KEY)
+        if generation is None:
+            self.shared.add(GENERATION_KEY, time.time(), None)
+            generation = self.shared.get(GENERATION_KEY)
+        if generation != local.generation:
+            # При первой сверке в LRU только то, что процесс записал сам.
+            if local.generation is not None:
+                local.clear()
+            local.generation = generation
+
+    def _remember(self, local_key, value, timeout):
+        if local_key is None:
+            return
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        self._local.set(local_key, pickled, self._local_ttl(timeout))
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._sync()
+            pickled = self._local.get(local_key)
+            if pickled is not None:
+                return pickle.loads(pickled)
+        missing = object()
+        value = self.shared.get(key, missing, version=version)
+        if value is missing:
+            return default
+        self._remember(local_key, value, None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(self._local_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(self._local_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._local.delete(local_key)
+        return self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._local.delete(local_key)
+        return self.shared.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._sync()
+            if self._local.get(local_key) is not None:
+                return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        self.shared.clear()
+        generation = time.time()
+        self.shared.set(GENERATION_KEY, generation, None)
+        self._local.clear()
+        self._local.generation = generation
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -1,6 +1,15 @@
+import logging
 from http import HTTPStatus
 
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods
+
+from .sqlite import journal_mode
+
+logger = logging.getLogger(__name__)
 
 
 def page_not_found(request, exception):
@@ -16,3 +25,30 @@ def csrf_failure(request, reason=''):
 def server_error(request):
     status = HTTPStatus.INTERNAL_SERVER_ERROR
     return render(request, 'core/500.html', status=status)
+
+
+@never_cache
+@require_http_methods(["GET", "HEAD"])
+def health(request):
+    """
+    Проверка для балансировщика: каждая база отвечает на запрос.
+    Для SQLite в ответе и режим журнала — видно, что WAL включён.
+    """
+    databases = {}
+    healthy = True
+    for connection in connections.all():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            state = {'ok': True}
+            if connection.vendor == 'sqlite':
+                state['journal_mode'] = journal_mode(connection)
+        except DatabaseError:
+            logger.exception('Health check failed for %s', connection.alias)
+            state = {'ok': False}
+            healthy = False
+        databases[connection.alias] = state
+    return JsonResponse(
+        {'status': 'ok' if healthy else 'error', 'databases': databases},
+        status=HTTPStatus.OK if healthy else HTTPStatus.SERVICE_UNAVAILABLE,
+    )
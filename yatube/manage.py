@@ -5,7 +5,12 @@ import sys
 
 
 def main():
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    # Тесты идут со своими настройками (yatube/settings_test.py), если
+    # модуль настроек не задан явно.
+    default = 'yatube.settings'
+    if sys.argv[1:2] == ['test']:
+        default = 'yatube.settings_test'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
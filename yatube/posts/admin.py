@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group
 
 
@@ -10,12 +11,19 @@ class PostAdmin(admin.ModelAdmin):
         'pub_date',
         'author',
         'group',
+        'views_count',
     )
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через FTS-индекс вместо LIKE '%...%'.
+        if search.is_available() and search.to_match_query(search_term):
+            return search.filter_matching(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
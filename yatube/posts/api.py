@@ -0,0 +1,274 @@
+"""
+JSON API только для чтения: посты, группы, комментарии и лента подписок.
+
+Ответы собираются из моделей напрямую, без шаблонов и миниатюр.
+Списки листаются курсором (?cursor=, ?limit=), набор полей задаётся
+параметром ?fields=id,text и определяет, какие колонки и связи читаются
+из базы. С ?format=ndjson список отдаётся целиком потоком строк JSON:
+он читается порциями по курсору, так что память не растёт с объёмом
+выгрузки.
+
+Ответы кэшируются (core.stampede.cache_view) вместе с кэшем страниц:
+ключ включает его версию, так что любое изменение данных сбрасывает и
+их, а при истечении ключа ответ пересчитывает один воркер.
+"""
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods
+
+from core import page_cache
+from core.query_budget import query_budget
+from core.stampede import cache_view
+
+from . import timeline
+from .models import Comment, Group, Post, User
+from .paginators import POSTS_PER_PAGE, CursorPaginator
+
+MAX_LIMIT = 100
+EXPORT_BATCH_SIZE = 500
+CACHE_TIMEOUT = 60
+
+# columns — что прочитать из базы (для only()), related — что
+# подтянуть через select_related, value — как достать значение.
+ApiField = namedtuple('ApiField', 'columns related value')
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+POST_FIELDS = {
+    'id': ApiField(['id'], None, lambda post: post.id),
+    'text': ApiField(['text'], None, lambda post: post.text),
+    'pub_date': ApiField(['pub_date'], None, lambda post: post.pub_date),
+    'author': ApiField(
+        ['author', 'author__username'], 'author',
+        lambda post: post.author.username,
+    ),
+    'group': ApiField(
+        ['group', 'group__slug'], 'group',
+        lambda post: post.group.slug if post.group_id else None,
+    ),
+    'image': ApiField(['image'], None, _image_url),
+    'image_width': ApiField(
+        ['image_width'], None, lambda post: post.image_width
+    ),
+    'image_height': ApiField(
+        ['image_height'], None, lambda post: post.image_height
+    ),
+    'comments_count': ApiField(
+        ['comments_count'], None, lambda post: post.comments_count
+    ),
+    'views_count': ApiField(
+        ['views_count'], None, lambda post: post.views_count
+    ),
+}
+
+GROUP_FIELDS = {
+    'id': ApiField(['id'], None, lambda group: group.id),
+    'title': ApiField(['title'], None, lambda group: group.title),
+    'slug': ApiField(['slug'], None, lambda group: group.slug),
+    'description': ApiField(
+        ['description'], None, lambda group: group.description
+    ),
+}
+
+COMMENT_FIELDS = {
+    'id': ApiField(['id'], None, lambda comment: comment.id),
+    'post': ApiField(['post'], None, lambda comment: comment.post_id),
+    'text': ApiField(['text'], None, lambda comment: comment.text),
+    'created': ApiField(['created'], None, lambda comment: comment.created),
+    'author': ApiField(
+        ['author', 'author__username'], 'author',
+        lambda comment: comment.author.username,
+    ),
+}
+
+POSTS_ORDERING = ('-pub_date', '-id')
+GROUPS_ORDERING = ('id',)
+COMMENTS_ORDERING = ('created', 'id')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def error_response(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(max_queries):
+    """
+    GET-only view API с бюджетом запросов, ошибками в JSON и кэшем
+    ответов (когда включён кэш страниц, PAGE_CACHE_ENABLED).
+    """
+    def decorator(view_func):
+        cached = cache_view(
+            CACHE_TIMEOUT, version=page_cache.get_version
+        )(view_func)
+
+        @require_http_methods(["GET"])
+        @query_budget(max_queries)
+        @wraps(view_func)
+        def view(request, *args, **kwargs):
+            handler = cached if settings.PAGE_CACHE_ENABLED else view_func
+            try:
+                return handler(request, *args, **kwargs)
+            except ApiError as error:
+                return error_response(str(error), error.status)
+        return view
+    return decorator
+
+
+def selected_fields(request, fields):
+    """Поля из ?fields=; без параметра — все поля ресурса."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(fields)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown or not names:
+        raise ApiError(
+            'Unknown fields: ' + ', '.join(unknown) if unknown
+            else 'Empty fields'
+        )
+    return names
+
+
+def sparse(queryset, fields, names, ordering):
+    """Читает из базы только колонки и связи запрошенных полей."""
+    columns = {
+        name.lstrip('-') for name in ordering
+        if name.lstrip('-') not in queryset.query.annotations
+    }
+    related = set()
+    for name in names:
+        columns.update(fields[name].columns)
+        if fields[name].related:
+            related.add(fields[name].related)
+    if related:
+        # select_related() без аргументов подтянул бы все связи.
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(columns))
+
+
+def serialize(obj, fields, names):
+    return {name: fields[name].value(obj) for name in names}
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', POSTS_PER_PAGE))
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def export(paginator, fields, names):
+    """Все записи подряд строками JSON, порциями по курсору."""
+    encoder = DjangoJSONEncoder()
+    cursor = None
+    while True:
+        page = paginator.get_page(cursor)
+        for obj in page:
+            yield encoder.encode(serialize(obj, fields, names)) + '\n'
+        cursor = page.next_cursor
+        if cursor is None:
+            return
+
+
+def list_response(request, queryset, fields, ordering):
+    names = selected_fields(request, fields)
+    queryset = sparse(queryset, fields, names, ordering)
+    if request.GET.get('format') == 'ndjson':
+        paginator = CursorPaginator(queryset, EXPORT_BATCH_SIZE, ordering)
+        return StreamingHttpResponse(
+            export(paginator, fields, names),
+            content_type='application/x-ndjson',
+        )
+    paginator = CursorPaginator(queryset, page_limit(request), ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize(obj, fields, names) for obj in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+def detail_response(request, queryset, fields, **lookup):
+    names = selected_fields(request, fields)
+    obj = get_object_or_404(sparse(queryset, fields, names, ()), **lookup)
+    return JsonResponse(serialize(obj, fields, names))
+
+
+@api_view(3)
+def posts(request):
+    return list_response(
+        request, Post.objects.all(), POST_FIELDS, POSTS_ORDERING
+    )
+
+
+@api_view(3)
+def post(request, post_id):
+    return detail_response(request, Post.objects.all(), POST_FIELDS,
+                           id=post_id)
+
+
+@api_view(4)
+def comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), id=post_id)
+    return list_response(
+        request, Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS, COMMENTS_ORDERING,
+    )
+
+
+@api_view(3)
+def groups(request):
+    return list_response(
+        request, Group.objects.all(), GROUP_FIELDS, GROUPS_ORDERING
+    )
+
+
+@api_view(4)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return list_response(
+        request, Post.objects.filter(group=group),
+        POST_FIELDS, POSTS_ORDERING,
+    )
+
+
+@api_view(4)
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return list_response(
+        request, Post.objects.filter(author=author),
+        POST_FIELDS, POSTS_ORDERING,
+    )
+
+
+@api_view(5)
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Authentication required', status=401)
+    return list_response(
+        request, timeline.feed(request.user), POST_FIELDS, timeline.ORDERING
+    )
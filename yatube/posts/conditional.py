@@ -0,0 +1,127 @@
+"""
+Валидаторы условных запросов (ETag / Last-Modified) для страниц постов.
+
+Валидаторы не требуют рендеринга: лентам хватает версии из
+feed_cache, которую сигналы поднимают при любом изменении ленты, а
+странице поста — одного запроса по первичному ключу за датой изменения
+поста, числом комментариев и временем последнего из них. В ETag входят
+id пользователя и query string: шапка и формы зависят от того, кто
+смотрит, а курсор — от страницы.
+"""
+import hashlib
+
+from django.db.models import OuterRef, Subquery
+
+from . import feed_cache
+from .models import Comment, Group, Post, User
+
+
+def _etag(request, *parts):
+    raw = '|'.join(
+        str(part) for part in
+        (request.user.pk, request.GET.urlencode(), *parts)
+    )
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _memoized(request, key, compute):
+    """Один расчёт на запрос: condition() спрашивает и ETag, и дату."""
+    cache = request.__dict__.setdefault('_conditional', {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _namespace_etag(request, namespace):
+    if namespace is None:
+        return None
+    return _etag(request, namespace, feed_cache.get_version(namespace))
+
+
+def _namespace_modified(namespace):
+    if namespace is None:
+        return None
+    return feed_cache.last_modified(namespace)
+
+
+def _group_namespace(request, slug):
+    def compute():
+        group_id = Group.objects.filter(slug=slug).values_list(
+            'id', flat=True
+        ).first()
+        return group_id and feed_cache.group_namespace(group_id)
+    return _memoized(request, ('group', slug), compute)
+
+
+def _profile_namespace(request, username):
+    def compute():
+        author_id = User.objects.filter(username=username).values_list(
+            'id', flat=True
+        ).first()
+        return author_id and feed_cache.profile_namespace(author_id)
+    return _memoized(request, ('profile', username), compute)
+
+
+def index_etag(request):
+    return _namespace_etag(request, feed_cache.INDEX)
+
+
+def index_last_modified(request):
+    return _namespace_modified(feed_cache.INDEX)
+
+
+def group_etag(request, slug):
+    return _namespace_etag(request, _group_namespace(request, slug))
+
+
+def group_last_modified(request, slug):
+    return _namespace_modified(_group_namespace(request, slug))
+
+
+def profile_etag(request, username):
+    return _namespace_etag(request, _profile_namespace(request, username))
+
+
+def profile_last_modified(request, username):
+    return _namespace_modified(_profile_namespace(request, username))
+
+
+def _post_state(request, post_id):
+    def compute():
+        last_comment = Comment.objects.filter(
+            post_id=OuterRef('pk')
+        ).order_by('-created', '-id').values('created')[:1]
+        return Post.objects.filter(pk=post_id).values(
+            'updated', 'comments_count', 'author_id',
+            last_comment=Subquery(last_comment),
+        ).first()
+    return _memoized(request, ('post', post_id), compute)
+
+
+def post_exists(request, post_id):
+    """Есть ли пост; после валидаторов — без нового запроса к БД."""
+    return _post_state(request, post_id) is not None
+
+
+def post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    # Версия профиля автора — из-за счётчика его постов на странице.
+    author_version = feed_cache.get_version(
+        feed_cache.profile_namespace(state['author_id'])
+    )
+    return _etag(
+        request, post_id, state['updated'].isoformat(),
+        state['comments_count'], author_version,
+    )
+
+
+def post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return max(
+        moment for moment in (state['updated'], state['last_comment'])
+        if moment is not None
+    )
@@ -0,0 +1,80 @@
+"""
+Денормализованные счётчики: посты и подписки пользователя, комментарии
+поста. Меняются атомарным UPDATE ... SET x = x + 1, поэтому страницы
+читают готовое число вместо COUNT(*).
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _count_subquery(model, field):
+    counted = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted), Value(0))
+
+
+def actual_user_counts():
+    """Выражения с точными значениями счётчиков для queryset User."""
+    return {
+        name: _count_subquery(model, field)
+        for name, (model, field) in USER_COUNTERS.items()
+    }
+
+
+def actual_comments_count():
+    return _count_subquery(Comment, 'post')
+
+
+def recount_user(user_id):
+    """Считает счётчики пользователя заново и сохраняет их."""
+    counts = User.objects.filter(pk=user_id).values(
+        **actual_user_counts()
+    ).first()
+    if counts is None:
+        return None
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=counts
+    )
+    return stats
+
+
+def stats_for(user_id):
+    """Счётчики пользователя; при отсутствии строки — посчитанные заново."""
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        stats = recount_user(user_id)
+    return stats
+
+
+def _shifted(field, delta):
+    return Greatest(F(field) + delta, Value(0))
+
+
+def change_user(user_id, field, delta):
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: _shifted(field, delta)}
+    )
+    if not updated and delta > 0:
+        # Строки ещё нет: пересчёт уже учтёт только что записанное.
+        # При уменьшении не пересчитываем — это может быть каскадное
+        # удаление самого пользователя.
+        recount_user(user_id)
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shifted('comments_count', delta)
+    )
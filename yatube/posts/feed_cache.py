@@ -0,0 +1,80 @@
+"""
+Версионированный кэш лент.
+
+У каждой ленты (главная, группа, профиль) есть своё пространство имён
+с номером версии. Версия входит в ключ закэшированного фрагмента
+вместе с номером страницы и курсором, а сигналы Post поднимают её при
+любом изменении, поэтому TTL можно держать большим: устаревшие
+фрагменты просто перестают запрашиваться и вытесняются сами.
+
+Кроме версии для каждой ленты хранится время последнего изменения —
+из него и версии строятся валидаторы условных запросов (posts.conditional).
+"""
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.tiered_cache import new_version
+
+INDEX = 'index'
+
+FeedCache = namedtuple('FeedCache', ['version', 'timeout'])
+
+
+def group_namespace(group_id):
+    return f'group:{group_id}'
+
+
+def profile_namespace(author_id):
+    return f'profile:{author_id}'
+
+
+def _version_key(namespace):
+    return f'feed-version:{namespace}'
+
+
+def _modified_key(namespace):
+    return f'feed-modified:{namespace}'
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Когда лента менялась, неизвестно — считаем, что только что.
+        cache.add(_modified_key(namespace), time.time(), None)
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def last_modified(namespace):
+    """Время последнего изменения ленты или None, если оно неизвестно."""
+    timestamp = cache.get(_modified_key(namespace))
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def bump(*namespaces):
+    """Инвалидирует все закэшированные страницы перечисленных лент."""
+    now = time.time()
+    for namespace in namespaces:
+        cache.set(_modified_key(namespace), now, None)
+        # Не incr: на файловом кэше он не атомарен (core.tiered_cache).
+        cache.set(_version_key(namespace), new_version(), None)
+
+
+def for_feed(namespace):
+    """Параметры для {% cache %} в шаблоне ленты."""
+    return FeedCache(get_version(namespace), settings.FEED_CACHE_TIMEOUT)
+
+
+def post_namespaces(post):
+    namespaces = [INDEX, profile_namespace(post.author_id)]
+    if post.group_id:
+        namespaces.append(group_namespace(post.group_id))
+    return namespaces
@@ -1,5 +1,8 @@
 from django import forms
 
+from core.imaging import ImageTooLarge
+
+from .images import check_upload
 from .models import Post, Comment
 
 
@@ -8,6 +11,16 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # У только что загруженного файла форма уже прочитала заголовок.
+        if image and hasattr(image, 'image'):
+            try:
+                check_upload(image)
+            except ImageTooLarge as error:
+                raise forms.ValidationError(str(error))
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,115 @@
+"""
+Приём картинок постов.
+
+Оригинал загрузки (фото с телефона на 5–20 МБ) не хранится: после
+сохранения поста фоновая задача ingest_image уменьшает картинку до
+IMAGE_MAX_SIZE по большей стороне, выбрасывает EXIF, перекодирует её в
+JPEG с качеством IMAGE_QUALITY, записывает размеры в
+Post.image_width/image_height и строит миниатюры уже по маленькому
+файлу. Декодирование и ресайз идут в пуле из IMAGE_PROCESSES процессов,
+чтобы не занимать потоки воркера очереди; при IMAGE_PROCESSES = 0
+(в тестах) — в текущем потоке.
+
+Картинки-«бомбы» отсекает ещё форма поста (check_upload): она смотрит
+только на размеры из заголовка файла, не декодируя пиксели.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from core import imaging
+from tasks.queue import task
+
+from . import thumbnails
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def check_upload(image):
+    """Проверяет размеры загруженной картинки; image — из формы."""
+    imaging.check_pixels(image.image.size, settings.IMAGE_MAX_PIXELS)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, а не fork: воркер многопоточный, и fork мог бы
+            # унести в дочерний процесс чужие захваченные блокировки.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def reencode(data):
+    args = (
+        data,
+        settings.IMAGE_MAX_SIZE,
+        settings.IMAGE_QUALITY,
+        settings.IMAGE_MAX_PIXELS,
+    )
+    if not settings.IMAGE_PROCESSES:
+        return imaging.reencode(*args)
+    try:
+        return _get_pool().submit(imaging.reencode, *args).result()
+    except BrokenProcessPool:
+        # Процесс убит, например, по памяти: следующей задаче нужен
+        # новый пул, а эта повторится по правилам очереди.
+        _reset_pool()
+        raise
+
+
+@task(max_attempts=3)
+def ingest_image(post_id, name):
+    if not Post.objects.filter(pk=post_id, image=name).exists():
+        # Картинку уже приняли, заменили или пост удалён.
+        return
+    field = Post._meta.get_field('image')
+    with field.storage.open(name) as file:
+        content, width, height = reencode(file.read())
+    new_name = field.storage.save(
+        field.generate_filename(None, 'image.jpg'), ContentFile(content)
+    )
+    with transaction.atomic():
+        post = (
+            Post.objects.select_for_update()
+            .filter(pk=post_id, image=name).first()
+        )
+        if post is not None:
+            # Ссылку на исходный файл снимет release_replaced_image.
+            post.image = new_name
+            post.image_width = width
+            post.image_height = height
+            post.save(update_fields=['image', 'image_width', 'image_height'])
+    if post is None or new_name == name:
+        field.storage.delete(new_name)
+    if post is None:
+        return
+    logger.info('Ingested %s as %s (%s×%s)', name, new_name, width, height)
+    thumbnails.generate(new_name)
+
+
+def schedule(post):
+    """Ставит приём картинки в очередь вместе с транзакцией поста."""
+    if post.image:
+        ingest_image.delay(post.pk, post.image.name)
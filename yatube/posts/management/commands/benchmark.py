@@ -0,0 +1,177 @@
+import json
+import math
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.urls import app_name, urlpatterns
+
+PERCENTILES = (50, 95, 99)
+
+# GET-параметры для страниц, которым без них нечего делать.
+QUERY_STRINGS = {
+    'search': {'q': 'город'},
+}
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все страницы posts через тестовый клиент и выводит '
+        'в JSON перцентили времени ответа, число запросов к БД и размер '
+        'страницы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Замеров на каждый URL.')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--username',
+                            help='От чьего имени открывать страницы.')
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть больше нуля')
+        client = Client()
+        user = self.get_user(options['username'])
+        client.force_login(user)
+        urls = self.build_urls(user)
+        results = {}
+        for name, url in urls.items():
+            for _ in range(options['warmup']):
+                self.measure(client, url, options['cold'])
+            samples = [
+                self.measure(client, url, options['cold'])
+                for _ in range(options['requests'])
+            ]
+            results[name] = self.summarize(url, samples)
+            self.stderr.write(
+                f"{name}: p50 {results[name]['latency_ms']['p50']} ms"
+            )
+        report = {
+            'settings': {
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'cold': options['cold'],
+            },
+            'dataset': self.dataset_size(),
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден')
+        # Самая тяжёлая лента подписок — у того, кто подписан на многих.
+        user = User.objects.order_by(
+            '-stats__following_count', 'pk'
+        ).first()
+        if user is None:
+            raise CommandError('База пуста, запустите generate_dataset')
+        return user
+
+    def build_urls(self, user):
+        """Адреса всех маршрутов posts на самых нагруженных объектах."""
+        author = (
+            User.objects.exclude(pk=user.pk)
+            .order_by('-stats__posts_count', 'pk').first()
+        ) or user
+        group = (
+            Group.objects.annotate(total=Count('posts'))
+            .order_by('-total', 'pk').first()
+        )
+        post = (
+            Post.objects.filter(author=user).first()
+            or Post.objects.order_by('-comments_count', 'pk').first()
+        )
+        values = {
+            'slug': group and group.slug,
+            'username': author.username,
+            'post_id': post and post.pk,
+        }
+        urls = {}
+        for pattern in urlpatterns:
+            params = {
+                name: values[name]
+                for name in pattern.pattern.converters
+            }
+            if None in params.values():
+                continue
+            url = reverse(f'{app_name}:{pattern.name}', kwargs=params)
+            if pattern.name in QUERY_STRINGS:
+                url += '?' + urlencode(QUERY_STRINGS[pattern.name])
+            urls[pattern.name] = url
+        return urls
+
+    def measure(self, client, url, cold):
+        """
+        Один запрос в транзакции, которая откатывается: страницы вроде
+        подписки меняют данные, а замеры должны быть повторяемыми.
+        """
+        if cold:
+            cache.clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    size = sum(map(len, response.streaming_content))
+                else:
+                    size = len(response.content)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return {
+            'seconds': elapsed,
+            'queries': len(queries),
+            'bytes': size,
+            'status': response.status_code,
+        }
+
+    def summarize(self, url, samples):
+        latencies = [sample['seconds'] * 1000 for sample in samples]
+        queries = [sample['queries'] for sample in samples]
+        return {
+            'url': url,
+            'status': sorted({sample['status'] for sample in samples}),
+            'latency_ms': {
+                f'p{percent}': round(percentile(latencies, percent), 3)
+                for percent in PERCENTILES
+            },
+            'queries': {
+                'min': min(queries),
+                'max': max(queries),
+                'mean': round(sum(queries) / len(queries), 2),
+            },
+            'bytes': max(sample['bytes'] for sample in samples),
+        }
+
+    def dataset_size(self):
+        return {
+            model._meta.model_name: model.objects.count()
+            for model in (User, Group, Post, Comment, Follow)
+        }
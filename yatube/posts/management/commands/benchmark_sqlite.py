@@ -0,0 +1,172 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from core.models import StoredFile
+
+from .benchmark import percentile
+
+# Настройки SQLite по умолчанию — то, с чем проект жил до SQLITE_PRAGMAS
+# и BEGIN IMMEDIATE.
+PROFILES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'PRAGMAS': {'journal_mode': 'delete', 'synchronous': 'full'},
+    },
+    'production': {
+        'ENGINE': settings.DATABASES['default']['ENGINE'],
+        'PRAGMAS': settings.SQLITE_PRAGMAS,
+    },
+}
+
+ALIAS = 'benchmark'
+
+ROWS = 10000
+
+
+def database(path, profile):
+    # Ожидание занятой базы одинаковое в обоих профилях, иначе
+    # сравнение было бы нечестным.
+    timeout = settings.SQLITE_PRAGMAS.get('busy_timeout', 5000) / 1000
+    return {
+        'ENGINE': PROFILES[profile]['ENGINE'],
+        'NAME': path,
+        'PRAGMAS': PROFILES[profile]['PRAGMAS'],
+        'OPTIONS': {'timeout': timeout},
+    }
+
+
+def seed():
+    with connections[ALIAS].schema_editor() as editor:
+        editor.create_model(StoredFile)
+    with transaction.atomic(using=ALIAS):
+        StoredFile.objects.using(ALIAS).bulk_create(
+            StoredFile(name=f'posts/{number}.jpg', size=number)
+            for number in range(ROWS)
+        )
+
+
+class Worker(threading.Thread):
+    def __init__(self, deadline):
+        super().__init__(daemon=True)
+        self.deadline = deadline
+        self.latencies = []
+        self.locked = 0
+
+    def run(self):
+        try:
+            while time.perf_counter() < self.deadline:
+                start = time.perf_counter()
+                try:
+                    self.operation()
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    self.locked += 1
+                    continue
+                self.latencies.append(time.perf_counter() - start)
+        finally:
+            connections[ALIAS].close()
+
+
+class Reader(Worker):
+    """Страница ленты: десяток строк подряд."""
+
+    def operation(self):
+        start = random.randint(1, ROWS)
+        list(
+            StoredFile.objects.using(ALIAS).filter(pk__gte=start)
+            .order_by('pk').values_list('pk', 'name')[:10]
+        )
+
+
+class Writer(Worker):
+    """
+    Запись после чтения в одной транзакции, как у
+    ContentAddressedStorage._acquire или post_edit.
+    """
+
+    def operation(self):
+        files = StoredFile.objects.using(ALIAS)
+        with transaction.atomic(using=ALIAS):
+            row = files.get(pk=random.randint(1, ROWS))
+            files.filter(pk=row.pk).update(references=F('references') + 1)
+
+
+def summary(workers, duration):
+    latencies = [value for worker in workers for value in worker.latencies]
+    result = {
+        'per_second': round(len(latencies) / duration, 1),
+        'locked': sum(worker.locked for worker in workers),
+    }
+    if latencies:
+        result['p95_ms'] = round(percentile(latencies, 95) * 1000, 2)
+    return result
+
+
+def run(profile, readers, writers, duration):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.sqlite3')
+        connections.databases[ALIAS] = database(path, profile)
+        try:
+            seed()
+            deadline = time.perf_counter() + duration
+            reading = [Reader(deadline) for _ in range(readers)]
+            writing = [Writer(deadline) for _ in range(writers)]
+            for worker in reading + writing:
+                worker.start()
+            for worker in reading + writing:
+                worker.join()
+        finally:
+            connections[ALIAS].close()
+            del connections[ALIAS]
+            del connections.databases[ALIAS]
+    return {
+        'reads': summary(reading, duration),
+        'writes': summary(writing, duration),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает временную базу SQLite через ORM параллельными '
+        'читателями и писателями (чтение и запись в одной транзакции) '
+        'и выводит в JSON число операций в секунду, p95 и '
+        'число ошибок «database is locked» для настроек SQLite по '
+        'умолчанию и для SQLITE_PRAGMAS с BEGIN IMMEDIATE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Секунд на каждый профиль.')
+        parser.add_argument('--profile', choices=PROFILES, action='append',
+                            help='Какие профили сравнивать (по умолчанию '
+                                 'все).')
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        if options['duration'] <= 0:
+            raise CommandError('--duration должен быть больше нуля')
+        if options['readers'] < 0 or options['writers'] < 0:
+            raise CommandError('Число потоков не может быть отрицательным')
+        results = {
+            profile: run(profile, options['readers'], options['writers'],
+                         options['duration'])
+            for profile in options['profile'] or PROFILES
+        }
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
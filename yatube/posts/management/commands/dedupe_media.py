@@ -0,0 +1,132 @@
+import hashlib
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from core import page_cache
+from core.models import StoredFile
+from core.storage import content_name, is_content_name
+from posts import feed_cache, thumbnails
+from posts.models import Post
+
+from .warm_thumbnails import media_files
+
+CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def megabytes(size):
+    return f'{size / 1024 / 1024:.1f} МБ'
+
+
+def recount(storage):
+    """Выставляет счётчики ссылок по числу постов с каждым файлом."""
+    used = dict(
+        Post.objects.exclude(image='')
+        .values_list('image')
+        .annotate(posts=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        StoredFile.objects.update(references=0)
+        known = set(
+            StoredFile.objects.values_list('name', flat=True)
+        )
+        for name, references in used.items():
+            if not is_content_name(name) or not storage.exists(name):
+                continue
+            if name in known:
+                StoredFile.objects.filter(name=name).update(
+                    references=references
+                )
+            else:
+                StoredFile.objects.create(
+                    name=name,
+                    size=storage.size(name),
+                    references=references,
+                )
+    return StoredFile.objects.filter(references=0).aggregate(
+        count=Count('id'), size=Sum('size')
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки из media/posts/ в хранилище по хешу '
+        'содержимого: одинаковые файлы остаются в одном экземпляре, '
+        'посты переключаются на него, счётчики ссылок пересчитываются. '
+        'Миниатюры старых имён удаляются и строятся заново по общему '
+        'файлу (warm_thumbnails).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='posts')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не менять.')
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        dry_run = options['dry_run']
+        # Имена по хешу, которые уже есть или появятся при переносе.
+        targets = {
+            name for name in media_files(options['directory'])
+            if is_content_name(name)
+        }
+        moved = duplicates = reclaimed = 0
+        namespaces = set()
+        for name in list(media_files(options['directory'])):
+            if is_content_name(name) or name.endswith('.upload'):
+                continue
+            path = storage.path(name)
+            size = os.path.getsize(path)
+            target = content_name(
+                options['directory'],
+                file_digest(path),
+                os.path.splitext(name)[1],
+            )
+            if target in targets:
+                duplicates += 1
+                reclaimed += size
+            else:
+                moved += 1
+                targets.add(target)
+            if dry_run:
+                continue
+            with transaction.atomic():
+                posts = Post.objects.filter(image=name)
+                for post in posts.only('author', 'group'):
+                    namespaces.update(feed_cache.post_namespaces(post))
+                posts.update(image=target)
+                if storage.exists(target):
+                    os.remove(path)
+                else:
+                    os.makedirs(os.path.dirname(storage.path(target)),
+                                exist_ok=True)
+                    os.replace(path, storage.path(target))
+            thumbnails.forget(name)
+            self.stdout.write(f'{name} -> {target}')
+        if namespaces:
+            # update() не отправляет сигналы Post, а закэшированные
+            # страницы ссылаются на старые имена картинок.
+            feed_cache.bump(*namespaces)
+            page_cache.invalidate()
+        if not dry_run:
+            unused = recount(storage)
+            if unused['count']:
+                self.stdout.write(
+                    f'Файлов без постов: {unused["count"]}, '
+                    f'{megabytes(unused["size"])}'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, дубликатов удалено: {duplicates}, '
+            f'освобождено: {megabytes(reclaimed)}'
+        ))
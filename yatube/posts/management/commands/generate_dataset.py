@@ -0,0 +1,237 @@
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post, User
+
+from .dedupe_media import recount
+
+WORDS = (
+    'день утро вечер город дорога море лес река дом окно книга письмо '
+    'друг время история работа музыка фильм поезд кофе дождь снег '
+    'солнце ветер небо улица парк мост кот собака сад вопрос ответ '
+    'новый старый тихий быстрый долгий светлый тёмный тёплый холодный '
+    'читать писать гулять думать смотреть слушать ждать помнить знать'
+).split()
+
+
+def power_law_weights(count, alpha):
+    """Веса по закону Ципфа: k-й по активности получает 1 / k^alpha."""
+    return [1 / (rank ** alpha) for rank in range(1, count + 1)]
+
+
+def sentence(rng, min_words, max_words):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return ' '.join(words).capitalize() + '.'
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """
+    Отключает auto_now_add, чтобы bulk_create сохранил даты из объектов,
+    а не проставил всем одно текущее время.
+    """
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими данными для нагрузочных замеров: '
+        'пользователи, группы, посты со степенным распределением '
+        'активности авторов, подписки, комментарии и картинки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows-per-user', type=int, default=30)
+        parser.add_argument('--images', type=int, default=20,
+                            help='Сколько разных картинок сгенерировать.')
+        parser.add_argument('--image-ratio', type=float, default=0.2,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--alpha', type=float, default=1.2,
+                            help='Показатель степенного распределения.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросать даты.')
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='По умолчанию — наибольший допустимый для СУБД.',
+        )
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days'])
+        prefix = f"{options['prefix']}{self.rng.getrandbits(24):06x}"
+
+        with transaction.atomic():
+            users = self.create_users(prefix, options['users'])
+            groups = self.create_groups(prefix, options['groups'])
+            weights = power_law_weights(len(users), options['alpha'])
+            images = self.create_images(prefix, options['images'])
+            posts = self.create_posts(
+                prefix, users, weights, groups, images,
+                options['posts'], options['image_ratio'],
+            )
+            follows = self.create_follows(
+                users, weights, options['follows_per_user']
+            )
+            comments = self.create_comments(
+                users, posts, options['comments'], options['alpha']
+            )
+
+        # bulk_create не шлёт сигналы: ленты, счётчики, рейтинги и ссылки
+        # на файлы картинок пересчитываются целиком, а закешированные
+        # страницы больше не актуальны.
+        call_command('rebuild_timelines', stdout=io.StringIO())
+        call_command('reconcile_counters', stdout=io.StringIO())
+        call_command('refresh_rankings', rebuild=True, stdout=io.StringIO())
+        recount(Post._meta.get_field('image').storage)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, групп: {len(groups)}, '
+            f'постов: {len(posts)}, подписок: {follows}, '
+            f'комментариев: {comments}, картинок: {len(images)}'
+        ))
+
+    def random_date(self):
+        return self.now - self.period * self.rng.random()
+
+    def create_users(self, prefix, count):
+        # Хеш пароля считается один раз: PBKDF2 на каждого пользователя
+        # занял бы больше времени, чем вся остальная генерация.
+        password = make_password(prefix)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{prefix}_{i}',
+                    first_name=self.rng.choice(WORDS).capitalize(),
+                    last_name=str(i),
+                    password=password,
+                )
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        return list(
+            User.objects.filter(username__startswith=f'{prefix}_')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def create_groups(self, prefix, count):
+        Group.objects.bulk_create(
+            Group(
+                title=f'Группа {i}',
+                slug=f'{prefix}-{i}',
+                description=sentence(self.rng, 5, 20),
+            )
+            for i in range(count)
+        )
+        return list(
+            Group.objects.filter(slug__startswith=f'{prefix}-')
+            .values_list('pk', flat=True)
+        )
+
+    def create_images(self, prefix, count):
+        # Картинки сразу в том виде, в каком их оставляет приём
+        # (posts.images): JPEG не больше IMAGE_MAX_SIZE, с размерами, в
+        # хранилище Post.image и с готовыми миниатюрами — иначе первый
+        # проход benchmark мерил бы их генерацию, а не страницу.
+        storage = Post._meta.get_field('image').storage
+        images = []
+        for i in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            size = (self.rng.randint(640, 1920), self.rng.randint(480, 1080))
+            content = io.BytesIO()
+            Image.new('RGB', size, color).save(content, 'JPEG')
+            name = storage.save(
+                f'posts/{prefix}_{i}.jpg', ContentFile(content.getvalue())
+            )
+            thumbnails.generate(name)
+            images.append((name, *size))
+        return images
+
+    def create_posts(self, prefix, users, weights, groups, images, count,
+                     ratio):
+        authors = self.rng.choices(users, weights, k=count)
+        posts = []
+        for author_id in authors:
+            image, width, height = (
+                self.rng.choice(images)
+                if images and self.rng.random() < ratio else ('', None, None)
+            )
+            posts.append(Post(
+                author_id=author_id,
+                group_id=(
+                    self.rng.choice(groups)
+                    if groups and self.rng.random() < 0.7 else None
+                ),
+                text=sentence(self.rng, 5, 80),
+                image=image,
+                image_width=width,
+                image_height=height,
+                pub_date=self.random_date(),
+            ))
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        return list(
+            Post.objects.filter(author__username__startswith=f'{prefix}_')
+            .values_list('pk', 'pub_date')
+        )
+
+    def create_follows(self, users, weights, per_user):
+        # Популярные авторы набирают и больше подписчиков.
+        follows = []
+        for user_id in users:
+            targets = set(self.rng.choices(
+                users, weights, k=self.rng.randint(0, 2 * per_user)
+            ))
+            targets.discard(user_id)
+            follows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in targets
+            )
+        Follow.objects.bulk_create(
+            follows, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        return len(follows)
+
+    def create_comments(self, users, posts, count, alpha):
+        if not posts:
+            return 0
+        # Обсуждаются в основном немногие посты.
+        shuffled = self.rng.sample(posts, len(posts))
+        weights = power_law_weights(len(shuffled), alpha)
+        comments = []
+        for post_id, pub_date in self.rng.choices(shuffled, weights, k=count):
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=self.rng.choice(users),
+                text=sentence(self.rng, 2, 30),
+                created=pub_date + (self.now - pub_date) * self.rng.random(),
+            ))
+        with explicit_dates(Comment._meta.get_field('created')):
+            Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        return len(comments)
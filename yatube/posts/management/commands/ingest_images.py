@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import ingest_image
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Ставит в очередь приём картинок, загруженных до posts.images: '
+        'уменьшение, перекодирование и запись размеров. Задачи выполняет '
+        'run_worker.'
+    )
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.exclude(image='')
+            .filter(image_width__isnull=True)
+            .values_list('pk', 'image')
+            .iterator()
+        )
+        queued = 0
+        for post_id, name in posts:
+            ingest_image.delay(post_id, name)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено в очередь картинок: {queued}'
+        ))
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import timeline
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Чьи ленты пересобрать; по умолчанию всех подписчиков.',
+        )
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        if usernames:
+            users = User.objects.filter(username__in=usernames)
+            missing = set(usernames) - set(
+                users.values_list('username', flat=True)
+            )
+            if missing:
+                raise CommandError(
+                    'Нет таких пользователей: ' + ', '.join(sorted(missing))
+                )
+            user_ids = users.values_list('id', flat=True)
+        else:
+            user_ids = Follow.objects.values_list(
+                'user_id', flat=True
+            ).distinct()
+        user_ids = list(user_ids)
+        timeline.reset_pull_authors()
+        for number, user_id in enumerate(user_ids, 1):
+            timeline.rebuild(user_id)
+            if number % 100 == 0:
+                self.stdout.write(f'{number}/{len(user_ids)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(user_ids)}'
+        ))
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts import counters
+from posts.models import Post, User, UserStats
+
+USER_FIELDS = list(counters.USER_COUNTERS)
+
+
+def batches(queryset, batch_size):
+    """Режет queryset на куски по первичному ключу."""
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными и чинит расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed_users = self.reconcile_users(batch_size)
+        fixed_posts = self.reconcile_posts(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено пользователей: {fixed_users}, '
+            f'постов: {fixed_posts}'
+        ))
+
+    def reconcile_users(self, batch_size):
+        fixed = 0
+        users = User.objects.annotate(**{
+            f'actual_{name}': expression
+            for name, expression in counters.actual_user_counts().items()
+        })
+        for batch in batches(users, batch_size):
+            stats = UserStats.objects.in_bulk([user.pk for user in batch])
+            created, changed = [], []
+            for user in batch:
+                actual = {
+                    name: getattr(user, f'actual_{name}')
+                    for name in USER_FIELDS
+                }
+                row = stats.get(user.pk)
+                if row is None:
+                    created.append(UserStats(user=user, **actual))
+                elif any(getattr(row, name) != actual[name]
+                         for name in USER_FIELDS):
+                    for name, value in actual.items():
+                        setattr(row, name, value)
+                    changed.append(row)
+            UserStats.objects.bulk_create(created, ignore_conflicts=True)
+            UserStats.objects.bulk_update(changed, USER_FIELDS)
+            fixed += len(created) + len(changed)
+        return fixed
+
+    def reconcile_posts(self, batch_size):
+        fixed = 0
+        posts = Post.objects.annotate(
+            actual=counters.actual_comments_count()
+        ).exclude(comments_count=F('actual')).only('pk', 'comments_count')
+        for batch in batches(posts, batch_size):
+            for post in batch:
+                post.comments_count = post.actual
+            Post.objects.bulk_update(batch, ['comments_count'])
+            fixed += len(batch)
+        return fixed
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = (
+        'Сдвигает точку отсчёта рейтингов «Популярное» и «В тренде» к '
+        'текущему моменту. Запускать периодически, например раз в час; '
+        'с --rebuild рейтинги считаются заново по постам и комментариям.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['rebuild']:
+            epoch = ranking.rebase(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Точка отсчёта рейтингов: {epoch:%Y-%m-%d %H:%M:%S}'
+            ))
+            return
+        rebuilt = ranking.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны рейтинги постов: {rebuilt}'
+        ))
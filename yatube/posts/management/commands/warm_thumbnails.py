@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+
+
+def media_files(directory):
+    """Пути картинок относительно MEDIA_ROOT, как их хранит ImageField."""
+    root = os.path.join(settings.MEDIA_ROOT, directory)
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            yield os.path.relpath(path, settings.MEDIA_ROOT).replace(
+                os.sep, '/'
+            )
+
+
+def warm(name):
+    try:
+        return thumbnails.build(name)
+    finally:
+        # Поток пула не закрыл бы своё соединение и после команды.
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для всех картинок из media/posts/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--directory', default='posts')
+
+    def handle(self, *args, **options):
+        names = list(media_files(options['directory']))
+        total = len(names)
+        failed = 0
+        # Pillow отпускает GIL на декодировании и ресайзе, поэтому
+        # потоков достаточно и не нужно поднимать Django в процессах.
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {pool.submit(warm, name): name for name in names}
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    data, complete = future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                else:
+                    # Строки пишутся из одного потока: SQLite не любит
+                    # параллельную запись.
+                    if complete:
+                        thumbnails.save(name, data)
+                    else:
+                        failed += 1
+                        self.stderr.write(f'{name}: не все миниатюры')
+                self.stdout.write(f'[{done}/{total}] {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {total - failed} из {total}'
+        ))
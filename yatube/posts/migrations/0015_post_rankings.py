@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+def compute_rankings(apps, schema_editor):
+    # Без этого старые посты стояли бы в рейтингах ниже любого нового
+    # до ручного refresh_rankings --rebuild.
+    from posts import ranking
+    ranking.rebuild(
+        post_model=apps.get_model('posts', 'Post'),
+        comment_model=apps.get_model('posts', 'Comment'),
+        epoch_model=apps.get_model('posts', 'RankingEpoch'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_views_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingEpoch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField(verbose_name='Точка отсчёта')),
+            ],
+            options={
+                'verbose_name': 'Точка отсчёта рейтингов',
+                'verbose_name_plural': 'Точки отсчёта рейтингов',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='popular_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг популярности'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг в тренде'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-popular_score', '-id'], name='post_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='post_trending_idx'),
+        ),
+        migrations.RunPython(compute_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariants',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Картинка')),
+                ('signature', models.CharField(max_length=32, verbose_name='Набор')),
+                ('variants', models.TextField(verbose_name='Миниатюры')),
+            ],
+            options={
+                'verbose_name': 'Миниатюры картинки',
+                'verbose_name_plural': 'Миниатюры картинок',
+            },
+        ),
+    ]
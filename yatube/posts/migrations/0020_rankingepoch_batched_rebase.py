@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_timelineentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankingepoch',
+            name='next_epoch',
+            field=models.DateTimeField(null=True, verbose_name='Новая точка отсчёта'),
+        ),
+        migrations.AddField(
+            model_name='rankingepoch',
+            name='rebased_to',
+            field=models.PositiveIntegerField(null=True, verbose_name='Пересчитано до поста'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -24,6 +26,10 @@ class Post(models.Model):
         db_index=True,
         verbose_name='Дата публикации',
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -41,12 +47,65 @@ class Post(models.Model):
 
     image = models.ImageField(
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         verbose_name='Картинка',
     )
+    # Размеры картинки после приёма (posts.images): шаблоны и API
+    # берут их отсюда, не открывая файл.
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ширина картинки',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Высота картинки',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+    views_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Просмотров',
+    )
+    popular_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Рейтинг популярности',
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Рейтинг в тренде',
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-popular_score', '-id'],
+                name='post_popular_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='post_trending_idx',
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -73,6 +132,12 @@ class Comment(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
         verbose_name = 'Коммент'
         verbose_name_plural = 'Комменты'
 
@@ -96,8 +161,129 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = [['user', 'author']]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
     def __str__(self):
         return f'{self.user} following {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Материализованная лента подписок: строка на каждую пару
+    (подписчик, пост), заполняется при публикации поста.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель ленты',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    # Копия Post.pub_date: лента сортируется по своему индексу
+    # (user, -pub_date, -post) и не ходит за датой в таблицу постов.
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        unique_together = [['user', 'post']]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.post_id} in timeline of {self.user_id}'
+
+
+class UserStats(models.Model):
+    """
+    Денормализованные счётчики пользователя. Поддерживаются сигналами
+    через F()-выражения, расхождения чинит reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'stats of {self.user_id}'
+
+
+class RankingEpoch(models.Model):
+    """
+    Точка отсчёта рейтингов постов (posts.ranking). Строка одна; её
+    сдвигает refresh_rankings вместе с пересчётом всех рейтингов.
+    """
+    epoch = models.DateTimeField(verbose_name='Точка отсчёта')
+    # Сдвиг идёт пачками по id: пока он не закончен, рейтинги постов с
+    # id <= rebased_to уже пересчитаны к next_epoch, остальные — ещё нет.
+    next_epoch = models.DateTimeField(
+        null=True, verbose_name='Новая точка отсчёта'
+    )
+    rebased_to = models.PositiveIntegerField(
+        null=True, verbose_name='Пересчитано до поста'
+    )
+
+    class Meta:
+        verbose_name = 'Точка отсчёта рейтингов'
+        verbose_name_plural = 'Точки отсчёта рейтингов'
+
+    def __str__(self):
+        return f'ranking epoch {self.epoch}'
+
+
+class ImageVariants(models.Model):
+    """
+    Готовые миниатюры картинки (posts.thumbnails): имена файлов всех
+    вариантов одной строкой, чтобы страница ленты находила миниатюры
+    всех своих постов одним запросом, без обращений к sorl-thumbnail.
+    """
+    source = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Картинка',
+    )
+    # Хеш набора вариантов: при его смене строки строятся заново.
+    signature = models.CharField(max_length=32, verbose_name='Набор')
+    variants = models.TextField(verbose_name='Миниатюры')
+
+    class Meta:
+        verbose_name = 'Миниатюры картинки'
+        verbose_name_plural = 'Миниатюры картинок'
+
+    def __str__(self):
+        return self.source
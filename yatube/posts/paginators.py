@@ -0,0 +1,254 @@
+import base64
+import hashlib
+import json
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+AFTER = 'n'
+BEFORE = 'p'
+
+
+def encode_cursor(direction, values):
+    """Непрозрачный токен курсора: направление и значения ключа."""
+    raw = json.dumps([direction, values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает токен курсора; на любой мусор бросает ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(raw.decode())
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if direction not in (AFTER, BEFORE) or not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return direction, values
+
+
+def make_cursor_page(paginator, items, next_cursor, previous_cursor):
+    """
+    Собирает обычный Page для курсорной выдачи: номер у него
+    относительный (1 или 2 — есть ли что-то раньше), а курсоры соседей
+    лежат в атрибутах next_cursor и previous_cursor.
+    """
+    number = 2 if previous_cursor else 1
+    # Page.has_next() сравнивает номер с num_pages, поэтому общего
+    # числа страниц не считаем, а подставляем "ещё одна или нет".
+    paginator.num_pages = number + 1 if next_cursor else number
+    page = paginator._get_page(items, number, paginator)
+    page.next_cursor = next_cursor
+    page.previous_cursor = previous_cursor
+    return page
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация: страница выбирается условием по ключу сортировки
+    вместо OFFSET и не требует COUNT(*), поэтому глубокие страницы
+    стоят столько же, сколько первая. Ключом могут быть поля модели
+    или аннотации выборки.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.keys = [name.lstrip('-') for name in self.ordering]
+        annotations = self.object_list.query.annotations
+        self.fields = [
+            annotations[key].output_field if key in annotations
+            else self.object_list.model._meta.get_field(key)
+            for key in self.keys
+        ]
+
+    def encode_cursor(self, direction, obj):
+        # value_to_string() читает значение по attname поля, а значение
+        # аннотации лежит в атрибуте с её именем.
+        return encode_cursor(direction, [
+            field.value_to_string(
+                SimpleNamespace(**{field.attname: getattr(obj, key)})
+            )
+            for key, field in zip(self.keys, self.fields)
+        ])
+
+    def decode_cursor(self, cursor):
+        direction, values = decode_cursor(cursor)
+        if len(values) != len(self.fields):
+            raise ValueError('Invalid cursor')
+        try:
+            return direction, [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise ValueError('Invalid cursor')
+
+    def _keyset_filter(self, values, direction):
+        """
+        Строит условие "строго после (или до) ключа" для составной
+        сортировки: (a < x) OR (a = x AND b < y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            descending = name.startswith('-')
+            field = name.lstrip('-')
+            after = (direction == AFTER)
+            lookup = 'lt' if descending == after else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def get_page(self, cursor):
+        """
+        Возвращает страницу после или до курсора. Битый или устаревший
+        курсор, как и номер страницы у обычного Paginator, не ломает
+        выдачу: отдаётся первая страница.
+        """
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except ValueError:
+                pass
+            else:
+                page = self._page_from(direction, values)
+                if page is not None:
+                    return page
+        return self._first_page()
+
+    def _first_page(self):
+        items = list(self.object_list[:self.per_page + 1])
+        next_cursor = None
+        if len(items) > self.per_page:
+            items = items[:self.per_page]
+            next_cursor = self.encode_cursor(AFTER, items[-1])
+        return make_cursor_page(self, items, next_cursor, None)
+
+    def _page_from(self, direction, values):
+        queryset = self.object_list.filter(
+            self._keyset_filter(values, direction)
+        )
+        if direction == BEFORE:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if not items:
+            return None
+        if direction == AFTER:
+            next_cursor = (
+                self.encode_cursor(AFTER, items[-1]) if has_more else None
+            )
+            previous_cursor = self.encode_cursor(BEFORE, items[0])
+        else:
+            items.reverse()
+            next_cursor = self.encode_cursor(AFTER, items[-1])
+            previous_cursor = (
+                self.encode_cursor(BEFORE, items[0]) if has_more else None
+            )
+        return make_cursor_page(self, items, next_cursor, previous_cursor)
+
+
+def table_estimate(model, using='default'):
+    """
+    Примерное число строк таблицы без COUNT(*): из статистики
+    планировщика PostgreSQL, на других СУБД — по наибольшему первичному
+    ключу (поиск по индексу). Оценка кэшируется.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    key = f'table-estimate:{using}:{table}'
+    estimate = cache.get(key)
+    if estimate is not None:
+        return estimate
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table]
+            )
+            row = cursor.fetchone()
+        # reltuples = -1, пока таблицу ни разу не анализировали.
+        if row and row[0] >= 0:
+            estimate = int(row[0])
+    if estimate is None:
+        estimate = model.objects.using(using).aggregate(
+            total=Max('pk')
+        )['total'] or 0
+    cache.set(key, estimate, settings.PAGINATOR_COUNT_TIMEOUT)
+    return estimate
+
+
+class ApproximatePaginator(Paginator):
+    """
+    Paginator, которому на больших выборках не нужен COUNT(*).
+
+    Число записей берётся из готового счётчика (estimate), для выборки
+    без фильтров — из оценки размера таблицы, иначе — из закэшированного
+    COUNT(*). Точный подсчёт остаётся там, где записей меньше
+    PAGINATOR_EXACT_COUNT_LIMIT: на малых выборках он дёшев, а номер
+    последней страницы должен быть точным. На больших выборках последняя
+    страница может оказаться неполной или пустой.
+    """
+
+    def __init__(self, object_list, per_page, estimate=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        limit = settings.PAGINATOR_EXACT_COUNT_LIMIT
+        estimate = self.estimate
+        if estimate is None and not self.object_list.query.where:
+            estimate = table_estimate(
+                self.object_list.model, self.object_list.db
+            )
+        if estimate is not None:
+            return estimate if estimate >= limit else super().count
+        return self._cached_count(limit)
+
+    def _cached_count(self, limit):
+        queryset = self.object_list
+        sql, params = queryset.query.sql_with_params()
+        raw = f'{queryset.db}|{sql}|{params}'
+        key = 'paginator-count:' + hashlib.md5(raw.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            if count >= limit:
+                cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+
+def paginate(request, queryset, per_page=POSTS_PER_PAGE, estimate=None,
+             ordering=('-pub_date', '-id')):
+    """
+    Страница ленты для запроса: по умолчанию курсорная (?cursor=),
+    а старые ссылки вида ?page=N продолжают работать через
+    ApproximatePaginator; estimate — известное заранее число записей.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return ApproximatePaginator(
+            queryset.order_by(*ordering), per_page, estimate=estimate
+        ).get_page(page_number)
+    return CursorPaginator(queryset, per_page, ordering).get_page(
+        request.GET.get('cursor')
+    )
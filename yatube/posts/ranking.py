@@ -0,0 +1,224 @@
+"""
+Рейтинги «Популярное» и «В тренде».
+
+Рейтинг поста — сумма весов событий (публикация, комментарий,
+просмотр), каждое из которых затухает вдвое за half_life рейтинга.
+Затухание не пересчитывается при чтении: вес события в момент t
+хранится как weight * 2 ** ((t - epoch) / half_life), то есть растёт
+со временем, а порядок постов при этом тот же, что у затухающей суммы.
+Поэтому событие — это один UPDATE ... SET score = score + x, а лента —
+обычная выборка по индексу (-score, -id), как хронологическая.
+
+Чтобы числа не переполнялись, refresh_rankings периодически
+сдвигает точку отсчёта (RankingEpoch) к текущему моменту и делит все
+рейтинги на накопившийся множитель; с --rebuild рейтинги считаются
+заново по комментариям. Сдвиг идёт пачками по id, каждая в своей
+транзакции, чтобы не держать блокировку записи на всю таблицу; пока он
+не закончен, событие пересчитывается к той точке отсчёта, на которой
+сейчас рейтинг поста. Точка отсчёта читается под блокировкой в той же
+транзакции, что и UPDATE рейтингов (update), поэтому сдвиг не может
+вклиниться между ними.
+"""
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (Case, ExpressionWrapper, F, FloatField,
+                              Value, When)
+from django.utils import timezone
+
+from .models import Comment, Post, RankingEpoch
+
+Ranking = namedtuple('Ranking', ['field', 'half_life'])
+
+POPULAR = 'popular'
+TRENDING = 'trending'
+
+RANKINGS = {
+    POPULAR: Ranking('popular_score', timedelta(days=7)),
+    TRENDING: Ranking('trending_score', timedelta(hours=12)),
+}
+
+POST_WEIGHT = 1.0
+COMMENT_WEIGHT = 3.0
+VIEW_WEIGHT = 0.1
+
+# Если с точки отсчёта прошло столько периодов полураспада, она
+# сдвигается сразу, не дожидаясь refresh_rankings: 2 ** 1023 — предел
+# float.
+MAX_HALF_LIVES = 500
+
+REBASE_BATCH_SIZE = 1000
+
+
+def ordering(name):
+    return ('-' + RANKINGS[name].field, '-id')
+
+
+def _half_lives(ranking, moment, epoch):
+    return (moment - epoch) / ranking.half_life
+
+
+def growth(ranking, moment, epoch):
+    """Во сколько раз событие в moment весит больше события в epoch."""
+    return 2 ** _half_lives(ranking, moment, epoch)
+
+
+def _epoch_row(lock=False):
+    rows = RankingEpoch.objects.all()
+    if lock:
+        rows = rows.select_for_update()
+    row = rows.first()
+    if row is None:
+        row = RankingEpoch.objects.create(epoch=timezone.now())
+    return row
+
+
+def _needs_rebase(row, moment):
+    return any(
+        _half_lives(ranking, moment, row.epoch) > MAX_HALF_LIVES
+        for ranking in RANKINGS.values()
+    )
+
+
+def _growth(ranking, moment, row):
+    """Множитель события: во время сдвига — свой для уже сдвинутых."""
+    current = Value(growth(ranking, moment, row.epoch))
+    if row.rebased_to is None:
+        return current
+    return Case(
+        When(
+            pk__lte=row.rebased_to,
+            then=Value(growth(ranking, moment, row.next_epoch)),
+        ),
+        default=current,
+        output_field=FloatField(),
+    )
+
+
+def increments(weight, moment, row):
+    """
+    Выражения для update(): прибавить всем рейтингам вес события.
+    weight — число или выражение (например, CASE по id постов); row —
+    RankingEpoch, прочитанная в той же транзакции.
+    """
+    return {
+        ranking.field: ExpressionWrapper(
+            F(ranking.field) + weight * _growth(ranking, moment, row),
+            output_field=FloatField(),
+        )
+        for ranking in RANKINGS.values()
+    }
+
+
+def update(queryset, weight, moment=None, **fields):
+    """
+    Прибавляет вес события к рейтингам постов queryset одним UPDATE
+    (вместе с fields) и возвращает число постов.
+    """
+    moment = moment or timezone.now()
+    with transaction.atomic():
+        row = _epoch_row(lock=True)
+        if not _needs_rebase(row, moment):
+            return queryset.update(
+                **fields, **increments(weight, moment, row)
+            )
+    rebase(moment)
+    return update(queryset, weight, moment, **fields)
+
+
+def add(post_id, weight, moment=None):
+    """Учитывает событие поста во всех рейтингах."""
+    update(Post.objects.filter(pk=post_id), weight, moment)
+
+
+def rebase(moment=None, batch_size=REBASE_BATCH_SIZE):
+    """
+    Сдвигает точку отсчёта к moment и пропорционально уменьшает все
+    рейтинги; порядок постов не меняется. Прерванный сдвиг продолжается
+    к прежней новой точке отсчёта.
+    """
+    moment = moment or timezone.now()
+    with transaction.atomic():
+        row = _epoch_row(lock=True)
+        if row.rebased_to is None:
+            row.next_epoch = moment
+            row.rebased_to = 0
+            row.save(update_fields=['next_epoch', 'rebased_to'])
+    while _rebase_batch(batch_size):
+        pass
+    return RankingEpoch.objects.values_list('epoch', flat=True).get()
+
+
+def _rebase_batch(batch_size):
+    """Сдвигает следующую пачку постов; False, когда сдвигать нечего."""
+    with transaction.atomic():
+        row = _epoch_row(lock=True)
+        if row.rebased_to is None:
+            return False
+        ids = list(
+            Post.objects.filter(pk__gt=row.rebased_to)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            row.epoch = row.next_epoch
+            row.next_epoch = row.rebased_to = None
+            row.save(update_fields=['epoch', 'next_epoch', 'rebased_to'])
+            return False
+        Post.objects.filter(pk__gt=row.rebased_to, pk__lte=ids[-1]).update(**{
+            ranking.field: F(ranking.field) / Value(
+                growth(ranking, row.next_epoch, row.epoch)
+            )
+            for ranking in RANKINGS.values()
+        })
+        row.rebased_to = ids[-1]
+        row.save(update_fields=['rebased_to'])
+    return True
+
+
+def _score(ranking, post, comment_dates, epoch):
+    # Когда были просмотры, не хранится: считаем их в день публикации.
+    published = growth(ranking, post.pub_date, epoch)
+    return (
+        (POST_WEIGHT + VIEW_WEIGHT * post.views_count) * published
+        + sum(
+            COMMENT_WEIGHT * growth(ranking, created, epoch)
+            for created in comment_dates
+        )
+    )
+
+
+def rebuild(batch_size=REBASE_BATCH_SIZE, post_model=Post,
+            comment_model=Comment, epoch_model=RankingEpoch):
+    """
+    Считает рейтинги всех постов заново по публикации, просмотрам и
+    комментариям от новой точки отсчёта; возвращает число постов.
+    Модели передаются параметрами для миграции, заполняющей рейтинги.
+    """
+    epoch = timezone.now()
+    fields = [ranking.field for ranking in RANKINGS.values()]
+    posts = post_model.objects.only(
+        'pk', 'pub_date', 'views_count'
+    ).order_by('pk')
+    rebuilt = last_pk = 0
+    with transaction.atomic():
+        epoch_model.objects.all().delete()
+        epoch_model.objects.create(epoch=epoch)
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return rebuilt
+            events = defaultdict(list)
+            comments = comment_model.objects.filter(
+                post__in=batch
+            ).values_list('post_id', 'created')
+            for post_id, created in comments:
+                events[post_id].append(created)
+            for post in batch:
+                for ranking in RANKINGS.values():
+                    setattr(post, ranking.field, _score(
+                        ranking, post, events[post.pk], epoch
+                    ))
+            post_model.objects.bulk_update(batch, fields)
+            rebuilt += len(batch)
+            last_pk = batch[-1].pk
@@ -0,0 +1,222 @@
+"""
+Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts — external content таблица поверх posts_post,
+синхронизируемая триггерами. Схема SQLite в Django пересоздаёт
+posts_post при добавлении полей, и триггеры при этом пропадают,
+поэтому индекс не создаётся миграцией, а проверяется и при
+необходимости восстанавливается после каждого migrate (ensure_index).
+На других СУБД поиск откатывается на icontains.
+"""
+import re
+
+from django.core.paginator import Paginator
+from django.db import connection, connections
+from django.utils.html import escape
+
+from .models import Post
+from .paginators import (AFTER, BEFORE, POSTS_PER_PAGE, CursorPaginator,
+                         decode_cursor, encode_cursor, make_cursor_page)
+
+FTS_TABLE = 'posts_post_fts'
+
+CREATE_TABLE = f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    text,
+    content='posts_post',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+'''
+
+TRIGGERS = {
+    f'{FTS_TABLE}_ai': f'''
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    ''',
+    f'{FTS_TABLE}_ad': f'''
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    ''',
+    f'{FTS_TABLE}_au': f'''
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    ''',
+}
+
+# Маркеры подсветки, которых не бывает в тексте: snippet() размечает
+# ими совпадения, а после экранирования HTML они меняются на <mark>.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SEARCH_SQL = f'''
+SELECT id, score, snippet FROM (
+    SELECT rowid AS id, rank AS score,
+           snippet({FTS_TABLE}, 0, char(2), char(3), '…', 24) AS snippet
+    FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+)
+'''
+
+
+def is_available(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_index(using='default', **kwargs):
+    """Создаёт FTS-таблицу и триггеры, если их нет, и перестраивает индекс."""
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'posts_post'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing.issuperset(TRIGGERS):
+            return
+        cursor.execute(CREATE_TABLE)
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def to_match_query(query):
+    """
+    Переводит пользовательский ввод в запрос FTS5: слова в кавычках,
+    чтобы операторы и спецсимволы не ломали синтаксис, последнее —
+    по префиксу.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def filter_matching(queryset, query):
+    """
+    Оставляет в queryset постов только подходящие под запрос.
+    RawSQL в id__in SQLite обернул бы в лишние скобки и прочитал как
+    скалярный подзапрос, поэтому условие добавляется через extra().
+    """
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[
+            f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[to_match_query(query)],
+    )
+
+
+def highlight(snippet):
+    return (
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchPaginator(Paginator):
+    """
+    Курсорная выдача поиска, упорядоченная по релевантности bm25:
+    курсор — пара (rank, id) последней показанной записи.
+    """
+
+    is_cursor = True
+
+    def __init__(self, query, per_page=POSTS_PER_PAGE):
+        super().__init__([], per_page)
+        self.match = to_match_query(query)
+
+    def _fetch(self, direction=None, key=None):
+        sql, params = SEARCH_SQL, [self.match]
+        order = 'ASC'
+        if key is not None:
+            op = '>' if direction == AFTER else '<'
+            sql += (
+                f' WHERE score {op} %s OR (score = %s AND id {op} %s)'
+            )
+            params += [key[0], key[0], key[1]]
+            if direction == BEFORE:
+                order = 'DESC'
+        sql += f' ORDER BY score {order}, id {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _posts(self, rows):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [row[0] for row in rows]
+        )
+        result = []
+        for post_id, score, snippet in rows:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_rank = score
+            post.snippet = highlight(snippet)
+            result.append(post)
+        return result
+
+    @staticmethod
+    def _cursor(direction, row):
+        return encode_cursor(direction, [row[1], row[0]])
+
+    def get_page(self, cursor):
+        direction, key = None, None
+        if cursor:
+            try:
+                direction, key = decode_cursor(cursor)
+                key = [float(key[0]), int(key[1])]
+            except (ValueError, TypeError, IndexError):
+                direction, key = None, None
+        rows = self._fetch(direction, key)
+        if key is not None and not rows:
+            direction, key = None, None
+            rows = self._fetch()
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == BEFORE:
+            rows.reverse()
+            next_cursor = self._cursor(AFTER, rows[-1]) if rows else None
+            previous_cursor = (
+                self._cursor(BEFORE, rows[0]) if has_more else None
+            )
+        else:
+            next_cursor = (
+                self._cursor(AFTER, rows[-1]) if has_more else None
+            )
+            previous_cursor = (
+                self._cursor(BEFORE, rows[0])
+                if rows and direction == AFTER else None
+            )
+        return make_cursor_page(
+            self, self._posts(rows), next_cursor, previous_cursor
+        )
+
+
+def search_posts(query, cursor=None):
+    """Страница результатов поиска с курсорной пагинацией."""
+    if to_match_query(query) is None:
+        return None
+    if is_available():
+        return SearchPaginator(query).get_page(cursor)
+    posts = Post.objects.select_related('author', 'group').filter(
+        text__icontains=query
+    )
+    return CursorPaginator(posts, POSTS_PER_PAGE).get_page(cursor)
@@ -0,0 +1,166 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import page_cache
+from core.storage import file_deleted
+
+from . import counters, feed_cache, ranking, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def rank_post(sender, instance, created, **kwargs):
+    if created:
+        ranking.add(instance.pk, ranking.POST_WEIGHT, instance.pub_date)
+
+
+@receiver(post_save, sender=Comment)
+def rank_comment(sender, instance, created, **kwargs):
+    if created:
+        ranking.add(
+            instance.post_id, ranking.COMMENT_WEIGHT, instance.created
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def unrank_comment(sender, instance, **kwargs):
+    ranking.add(instance.post_id, -ranking.COMMENT_WEIGHT, instance.created)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first()
+            or (None, '')
+        )
+
+
+def _release_image(name):
+    # Файл мог понадобиться откатившейся транзакции, поэтому ссылка
+    # снимается только после коммита.
+    if name:
+        storage = Post._meta.get_field('image').storage
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', '')
+    if previous != instance.image.name:
+        _release_image(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    _release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+def _bump_on_commit(*namespaces):
+    # До коммита конкурентный запрос ещё видит старые данные: с новой
+    # версией он закэшировал бы их фрагмент и ETag на FEED_CACHE_TIMEOUT.
+    transaction.on_commit(lambda: feed_cache.bump(*namespaces))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds(sender, instance, **kwargs):
+    namespaces = feed_cache.post_namespaces(instance)
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id and previous_group_id != instance.group_id:
+        namespaces.append(feed_cache.group_namespace(previous_group_id))
+    _bump_on_commit(*namespaces)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_pages(sender, **kwargs):
+    # Как и версии лент: страница, отрендеренная до коммита, не должна
+    # попасть в кэш под новой версией.
+    transaction.on_commit(page_cache.invalidate)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    _bump_on_commit(feed_cache.group_namespace(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profiles(sender, instance, **kwargs):
+    # Профиль показывает число подписок и подписчиков, а ETag профиля
+    # строится из версии его ленты.
+    _bump_on_commit(
+        feed_cache.profile_namespace(instance.user_id),
+        feed_cache.profile_namespace(instance.author_id),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.followers_changed(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.followers_changed(instance.author_id)
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(file_deleted)
+def forget_thumbnails(sender, name, **kwargs):
+    thumbnails.forget(name)
@@ -0,0 +1,72 @@
+import logging
+
+from django import template
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from .. import thumbnails
+
+register = template.Library()
+
+logger = logging.getLogger(__name__)
+
+# Картинка занимает всю ширину колонки, но не больше 960 px.
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+def srcset(images):
+    return ', '.join(f'{url} {variant.width}w' for variant, url in images)
+
+
+@register.simple_tag
+def prefetch_post_images(posts):
+    """
+    Находит миниатюры всех постов страницы одним запросом; ставится
+    перед циклом, в котором посты выводятся через {% post_image %}.
+    """
+    posts = [post for post in posts if post.image]
+    try:
+        resolved = thumbnails.resolve(post.image.name for post in posts)
+    except Exception:
+        # Каждый {% post_image %} попробует свою картинку сам.
+        logger.exception('Thumbnails prefetch failed')
+        return ''
+    for post in posts:
+        post._image_variants = resolved[post.image.name]
+    return ''
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, eager=False):
+    """
+    Картинка поста в <picture>: варианты разной ширины в srcset, WebP
+    с запасным JPEG, размеры в атрибутах, чтобы вёрстка не прыгала при
+    загрузке. Картинки ниже первого экрана (eager=False) грузятся лениво.
+    """
+    if not post.image:
+        return {}
+    try:
+        variants = getattr(post, '_image_variants', None)
+        if variants is None:
+            variants = thumbnails.variants(post.image)
+    except Exception:
+        # Как {% thumbnail %}: битая картинка не роняет страницу.
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnails failed for %s', post.image.name)
+        return {}
+    fallback = variants['JPEG']
+    variant, url = fallback[-1]
+    return {
+        'sources': [
+            {'type': MIME_TYPES[fmt], 'srcset': srcset(images)}
+            for fmt, images in variants.items() if fmt != 'JPEG'
+        ],
+        'url': url,
+        'width': variant.width,
+        'height': variant.height,
+        'srcset': srcset(fallback),
+        'sizes': SIZES,
+        'eager': eager,
+    }
@@ -0,0 +1,167 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(15)
+        ]
+        cls.post = cls.posts[-1]
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Коммент {i}'
+            )
+
+    def setUp(self):
+        self.client = Client()
+
+    def get_json(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, response.json()
+
+    def test_posts_pages(self):
+        """Лента постов листается курсором без пропусков и повторов"""
+        _, first = self.get_json('posts:api_posts')
+        self.assertEqual(len(first['results']), 10)
+        self.assertIsNone(first['previous'])
+        response = self.client.get(first['next'])
+        second = response.json()
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+    def test_post_fields(self):
+        """Пост сериализуется со всеми полями"""
+        _, data = self.get_json('posts:api_post', self.post.id)
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['author'], 'author')
+        self.assertEqual(data['group'], 'group')
+        self.assertEqual(data['comments_count'], 3)
+        self.assertIsNone(data['image'])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только нужные поля и не джойнит лишнего"""
+        with CaptureQueriesContext(connection) as queries:
+            _, data = self.get_json(
+                'posts:api_posts', fields='id,text', limit=2
+            )
+        self.assertEqual(
+            [set(post) for post in data['results']], [{'id', 'text'}] * 2
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        self.assertNotIn('"image"', queries[0]['sql'])
+
+    def test_related_fields_in_one_query(self):
+        """Автор и группа читаются тем же запросом, что и посты"""
+        with CaptureQueriesContext(connection) as queries:
+            self.get_json('posts:api_posts', fields='id,author,group')
+        self.assertEqual(len(queries), 1)
+
+    def test_bad_params(self):
+        """Неизвестные поля и неверный limit дают 400"""
+        for params in ({'fields': 'id,password'}, {'limit': '0'},
+                       {'limit': 'many'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('posts:api_posts'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_group_profile_and_comments(self):
+        """Ленты группы и автора, комментарии поста"""
+        _, group = self.get_json('posts:api_group_posts', 'group', limit=20)
+        self.assertEqual(len(group['results']), 15)
+        _, profile = self.get_json(
+            'posts:api_profile_posts', 'reader', limit=20
+        )
+        self.assertEqual(profile['results'], [])
+        _, comments = self.get_json('posts:api_comments', self.post.id)
+        self.assertEqual(
+            [comment['text'] for comment in comments['results']],
+            ['Коммент 0', 'Коммент 1', 'Коммент 2'],
+        )
+        _, groups = self.get_json('posts:api_groups')
+        self.assertEqual(groups['results'][0]['slug'], 'group')
+
+    def test_missing_objects(self):
+        """Несуществующие объекты дают 404"""
+        response = self.client.get(
+            reverse('posts:api_group_posts', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_feed(self):
+        """Лента подписок требует авторизации"""
+        response = self.client.get(reverse('posts:api_follow'))
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.reader)
+        _, data = self.get_json('posts:api_follow', fields='id')
+        self.assertEqual(data['results'][0], {'id': self.post.id})
+
+    def test_read_only(self):
+        """API принимает только GET"""
+        response = self.client.post(reverse('posts:api_posts'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_ndjson_export(self):
+        """Выгрузка идёт потоком и читается порциями"""
+        response = self.client.get(
+            reverse('posts:api_posts'), {'format': 'ndjson', 'fields': 'id'}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        with CaptureQueriesContext(connection) as queries:
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [post.id for post in reversed(self.posts)],
+        )
+        self.assertEqual(len(queries), 1)
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class ApiCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+
+    def get_ids(self):
+        response = self.client.get(
+            reverse('posts:api_posts'), {'fields': 'id'}
+        )
+        return [item['id'] for item in response.json()['results']]
+
+    def test_responses_are_cached_until_data_changes(self):
+        """Повторный запрос — из кэша, новый пост сбрасывает кэш"""
+        self.get_ids()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_ids(), [self.post.id])
+        self.assertEqual(len(queries), 0)
+        post = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(self.get_ids(), [post.id, self.post.id])
@@ -0,0 +1,105 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+from core.models import StoredFile
+from core.storage import is_content_name
+from posts.management.commands.benchmark import percentile
+from posts.models import (Comment, Follow, ImageVariants, Post,
+                          TimelineEntry, User)
+from posts.urls import urlpatterns
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DatasetBenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_dataset', users=20, groups=3, posts=60, comments=40,
+            follows_per_user=3, images=2, seed=1, stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_dataset(self):
+        """Генератор создаёт связанные данные и пересчитывает ленты"""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    def test_images_are_stored_like_uploads(self):
+        """Картинки лежат в хранилище по хешу, с миниатюрами и ссылками"""
+        used = dict(
+            Post.objects.exclude(image='').values_list('image')
+            .annotate(posts=Count('id')).order_by()
+        )
+        self.assertTrue(all(map(is_content_name, used)))
+        self.assertEqual(
+            dict(StoredFile.objects.filter(references__gt=0)
+                 .values_list('name', 'references')),
+            used,
+        )
+        self.assertEqual(
+            ImageVariants.objects.filter(source__in=used).count(), len(used)
+        )
+        self.assertGreater(
+            Post.objects.dates('pub_date', 'day').count(), 1
+        )
+
+    def test_activity_follows_power_law(self):
+        """Самый активный автор пишет заметно больше медианного"""
+        counts = sorted(
+            User.objects.values_list('stats__posts_count', flat=True)
+        )
+        self.assertGreater(counts[-1], 3 * counts[len(counts) // 2])
+
+    def test_benchmark_report(self):
+        """Отчёт содержит все страницы posts с метриками"""
+        stdout = StringIO()
+        # Миниатюры готовы заранее: даже первый проход укладывается
+        # в бюджет запросов страниц.
+        with self.assertNoLogs('core.query_budget', 'WARNING'):
+            call_command(
+                'benchmark', requests=3, warmup=0, stdout=stdout,
+                stderr=StringIO(),
+            )
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(
+            set(report['results']),
+            {pattern.name for pattern in urlpatterns},
+        )
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertEqual(
+                    set(result['latency_ms']), {'p50', 'p95', 'p99'}
+                )
+                self.assertTrue(all(
+                    status < 500 for status in result['status']
+                ))
+                self.assertGreater(result['queries']['max'], 0)
+        self.assertEqual(report['dataset']['post'], 60)
+        self.assertEqual(Post.objects.count(), 60)
+
+
+class PercentileTest(TestCase):
+    def test_nearest_rank(self):
+        """Перцентиль считается по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
@@ -1,9 +1,15 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
 from django.urls import reverse
 
-from ..models import Post
+from core import page_cache
+
+from .. import feed_cache
+from ..models import Group, Post
 
 User = get_user_model()
 
@@ -30,3 +36,85 @@ class PostModelTest(TestCase):
         self.assertEqual(response.context.get('page_obj')[0], self.post)
         cache.clear()
         self.assertIsNot(response.context.get('page_obj')[0], self.post)
+
+
+class FeedCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='HasNoName')
+        self.group = Group.objects.create(title='test', slug='test')
+        self.other_group = Group.objects.create(title='other', slug='other')
+        Post.objects.bulk_create([
+            Post(text=f'Пост номер {i}', author=self.user, group=self.group)
+            for i in range(1, 14)
+        ])
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_pages_are_cached_separately(self):
+        """Разные страницы ленты не отдают один и тот же фрагмент"""
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, 'Пост номер 1<')
+
+    def test_new_post_is_shown_immediately(self):
+        """Новый пост сразу виден на главной, в группе и в профиле"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Свежий пост')
+
+    def test_moved_post_leaves_old_group(self):
+        """Пост, перенесённый в другую группу, пропадает из старой"""
+        post = Post.objects.create(
+            text='Переносимый пост', author=self.user, group=self.group
+        )
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.assertContains(self.guest_client.get(url), post.text)
+        post.group = self.other_group
+        post.save()
+        self.assertNotContains(self.guest_client.get(url), post.text)
+
+    def test_version_changes_after_commit(self):
+        """Версия ленты меняется только после коммита записи"""
+        before = feed_cache.get_version(feed_cache.INDEX)
+        with transaction.atomic():
+            Post.objects.create(text='Свежий пост', author=self.user)
+            # Лента, отрендеренная сейчас, ещё без поста: с новой версией
+            # её фрагмент пережил бы коммит.
+            self.assertEqual(feed_cache.get_version(feed_cache.INDEX), before)
+        self.assertNotEqual(feed_cache.get_version(feed_cache.INDEX), before)
+
+
+class FeedVersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_bumps_get_distinct_versions(self):
+        """
+        Инвалидации, прочитавшие одну и ту же версию, не сливаются в
+        одну: новая версия не выводится из старой
+        """
+        before = feed_cache.get_version(feed_cache.INDEX)
+        with mock.patch.object(cache, 'incr', side_effect=AssertionError):
+            feed_cache.bump(feed_cache.INDEX)
+            first = feed_cache.get_version(feed_cache.INDEX)
+            feed_cache.bump(feed_cache.INDEX)
+            second = feed_cache.get_version(feed_cache.INDEX)
+            page_cache.invalidate()
+        self.assertEqual(len({before, first, second}), 3)
+
+    def test_evicted_version_is_not_reused(self):
+        before = feed_cache.get_version(feed_cache.INDEX)
+        cache.delete('feed-version:index')
+        self.assertNotEqual(feed_cache.get_version(feed_cache.INDEX), before)
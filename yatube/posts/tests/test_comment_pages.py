@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.paginators import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+TOTAL = COMMENTS_PER_PAGE * 2 + 5
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.quiet = Post.objects.create(text='Тихий пост', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Коммент {i}'
+            )
+            for i in range(TOTAL)
+        ]
+        Comment.objects.create(post=cls.quiet, author=cls.author, text='Один')
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_detail_renders_first_page(self):
+        """На странице поста только первая страница комментариев"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        page = response.context['comments_page']
+        self.assertEqual(list(page), self.comments[:COMMENTS_PER_PAGE])
+        self.assertIsNotNone(page.next_cursor)
+        self.assertContains(
+            response, reverse('posts:post_comments', args=[self.post.id])
+        )
+
+    def test_fragments_load_remaining_comments(self):
+        """Фрагменты по курсору отдают остальные комментарии по порядку"""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        cursor = self.client.get(url).context['comments_page'].next_cursor
+        fragment_url = reverse('posts:post_comments', args=[self.post.id])
+        loaded = []
+        while cursor:
+            response = self.client.get(fragment_url, {'cursor': cursor})
+            self.assertTemplateUsed(response, 'includes/comment_list.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            page = response.context['comments_page']
+            loaded.extend(page)
+            cursor = page.next_cursor
+        self.assertEqual(loaded, self.comments[COMMENTS_PER_PAGE:])
+
+    def test_last_fragment_has_no_more_link(self):
+        """У последней порции нет ссылки «Показать ещё»"""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.quiet.id])
+        )
+        self.assertContains(response, 'Один')
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_fragment_for_missing_post(self):
+        """Фрагмент несуществующего поста — 404"""
+        response = self.client.get(reverse('posts:post_comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_queries_do_not_depend_on_comment_count(self):
+        """Число запросов страницы поста не зависит от числа комментариев"""
+        counts = []
+        for post in (self.quiet, self.post):
+            url = reverse('posts:post_detail', args=[post.id])
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
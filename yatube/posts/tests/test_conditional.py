@@ -0,0 +1,135 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile', args=['author']),
+            'post': reverse('posts:post_detail', args=[self.post.id]),
+        }
+        cache.clear()
+        self.client = Client()
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без рендеринга"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                with CaptureQueriesContext(connection) as queries:
+                    repeated = self.revalidate(url, response)
+                self.assertEqual(repeated.status_code, 304)
+                self.assertLessEqual(len(queries), 1)
+
+    def test_if_modified_since(self):
+        """Главная отвечает 304 на If-Modified-Since"""
+        response = self.client.get(self.urls['index'])
+        repeated = self.client.get(
+            self.urls['index'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(repeated.status_code, 304)
+
+    def test_new_post_changes_feeds(self):
+        """Новый пост меняет валидаторы главной, группы и профиля"""
+        responses = {
+            name: self.client.get(self.urls[name])
+            for name in ('index', 'group', 'profile')
+        }
+        Post.objects.create(text='Новый', author=self.author,
+                            group=self.group)
+        for name, response in responses.items():
+            with self.subTest(page=name):
+                self.assertEqual(
+                    self.revalidate(self.urls[name], response).status_code,
+                    200,
+                )
+
+    def test_etag_taken_before_commit_is_revalidated(self):
+        """ETag, выданный до коммита записи, после коммита не даёт 304"""
+        responses = []
+
+        def fetch():
+            try:
+                responses.append(Client().get(self.urls['index']))
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            Post.objects.create(text='Новый', author=self.author)
+            # Другое соединение ещё видит ленту без нового поста.
+            reader = threading.Thread(target=fetch)
+            reader.start()
+            reader.join()
+        response = self.revalidate(self.urls['index'], responses[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый')
+
+    def test_post_changes(self):
+        """Правка поста и новый комментарий меняют ETag страницы поста"""
+        url = self.urls['post']
+        response = self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Коммент')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        response = self.client.get(url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_follow_changes_profile(self):
+        """Подписка меняет ETag профиля (счётчики и кнопка)"""
+        url = self.urls['profile']
+        response = self.client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_etag_depends_on_user_and_page(self):
+        """ETag различается для разных пользователей и страниц"""
+        url = self.urls['index']
+        anonymous = self.client.get(url)
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertEqual(
+            self.revalidate(url, anonymous, client=reader).status_code, 200
+        )
+        self.assertEqual(
+            self.client.get(
+                url + '?page=1', HTTP_IF_NONE_MATCH=anonymous['ETag']
+            ).status_code,
+            200,
+        )
+
+    def test_missing_objects(self):
+        """Для несуществующих объектов по-прежнему 404"""
+        response = self.client.get(
+            reverse('posts:group_list', args=['missing']),
+            HTTP_IF_NONE_MATCH='"anything"',
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_create_and_delete_change_posts_count(self):
+        self.client.post(reverse('posts:post_create'), {'text': 'Текст'})
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        Post.objects.filter(author=self.user).delete()
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+
+    def test_add_comment_changes_comments_count(self):
+        post = Post.objects.create(text='Текст', author=self.author)
+        url = reverse('posts:add_comment', args=[post.id])
+        self.client.post(url, {'text': 'Коммент'})
+        self.client.post(url, {'text': 'Коммент'})
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        Comment.objects.filter(post=post).first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_follow_and_unfollow_change_counts(self):
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_profile_reads_counter_without_count_query(self):
+        Post.objects.create(text='Текст', author=self.author)
+        url = reverse('posts:profile', args=[self.author.username])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['author_stats'].posts_count, 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_reconcile_counters_fixes_drift(self):
+        post = Post.objects.create(text='Текст', author=self.author)
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.filter(user=self.author).update(
+            posts_count=10, followers_count=10
+        )
+        UserStats.objects.filter(user=self.user).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        author_stats = self.stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
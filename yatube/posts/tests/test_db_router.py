@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import resolve, reverse
+
+from core import db_router
+from core.db_router import (PIN_COOKIE, ReplicaMiddleware, ReplicaRouter,
+                            replica_reads)
+from core.management.commands.sync_replicas import copy
+from core.page_cache import PageCacheMiddleware
+from posts.models import Post
+
+User = get_user_model()
+
+
+@replica_reads
+def read_view(request):
+    return HttpResponse(str(db_router.reading_from_replica()))
+
+
+def write_view(request):
+    return HttpResponse(str(db_router.reading_from_replica()))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        cache.clear()
+
+    def call(self, request, view):
+        def get_response(request):
+            return middleware.process_view(request, view, (), {}) or view(
+                request
+            )
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_reads_go_to_primary_by_default(self):
+        self.assertIsNone(self.router.db_for_read(Post))
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_marked_view_reads_from_replica(self):
+        """GET-запрос помеченной view читает с реплики, и только он"""
+        response = self.call(self.factory.get('/'), read_view)
+        self.assertEqual(response.content, b'True')
+        self.assertFalse(db_router.reading_from_replica())
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_router_picks_replica_inside_marked_view(self):
+        token = db_router._use_replica.set(True)
+        try:
+            self.assertIn(
+                self.router.db_for_read(Post), ['replica1', 'replica2']
+            )
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        finally:
+            db_router._use_replica.reset(token)
+
+    def test_unmarked_view_and_post_use_primary(self):
+        response = self.call(self.factory.get('/'), write_view)
+        self.assertEqual(response.content, b'False')
+        response = self.call(self.factory.post('/'), read_view)
+        self.assertEqual(response.content, b'False')
+
+    def test_pinned_visitor_reads_from_primary(self):
+        """Кука после записи отправляет чтения в основную базу"""
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.call(request, read_view).content, b'False')
+
+    def test_post_sets_pin_cookie(self):
+        self.assertFalse(db_router.recently_written())
+        response = self.call(self.factory.post('/'), write_view)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(db_router.recently_written())
+
+    def test_get_that_writes_sets_pin_cookie(self):
+        """GET, который писал в базу, тоже ставит куку"""
+        def follow(request):
+            self.router.db_for_write(Post)
+            return HttpResponse()
+        self.assertNotIn(
+            PIN_COOKIE, self.call(self.factory.get('/'), write_view).cookies
+        )
+        response = self.call(self.factory.get('/'), follow)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(db_router.recently_written())
+
+    def test_failed_post_does_not_pin(self):
+        def rejected(request):
+            return HttpResponse(status=400)
+        response = self.call(self.factory.post('/'), rejected)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_is_primary(self):
+        self.assertEqual(
+            self.call(self.factory.get('/'), read_view).content, b'False'
+        )
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+    def test_page_cache_skips_replica_render_after_write(self):
+        """Страница с реплики сразу после записи не попадает в кэш"""
+        request = self.factory.get('/')
+        response = HttpResponse('page')
+        token = db_router._use_replica.set(True)
+        try:
+            self.assertTrue(
+                PageCacheMiddleware.is_cacheable(request, response)
+            )
+            db_router.mark_write()
+            self.assertFalse(
+                PageCacheMiddleware.is_cacheable(request, response)
+            )
+        finally:
+            db_router._use_replica.reset(token)
+
+    def test_read_only_views_are_marked(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(text='Пост', author=author)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[author.username]),
+            reverse('posts:post_detail', args=[post.id]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertTrue(resolve(url).func.replica_reads)
+        self.assertFalse(
+            getattr(resolve(reverse('posts:post_create')).func,
+                    'replica_reads', False)
+        )
+
+
+class ReadYourWritesTest(TransactionTestCase):
+    """Основная база выступает и репликой: считаем обращения к реплике."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_author_sees_own_post_right_after_creating_it(self):
+        with mock.patch.object(
+            db_router.random, 'choice', return_value='default'
+        ) as choice:
+            self.client.get(reverse('posts:index'))
+            self.assertTrue(choice.called)
+            choice.reset_mock()
+            response = self.client.post(
+                reverse('posts:post_create'), {'text': 'Свежий пост'}
+            )
+            self.assertIn(PIN_COOKIE, response.cookies)
+            response = self.client.get(reverse('posts:index'))
+            self.assertFalse(choice.called)
+        self.assertContains(response, 'Свежий пост')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_follower_sees_feed_right_after_following(self):
+        """Подписка по GET тоже отправляет чтения ленты в основную базу"""
+        author = User.objects.create_user(username='followed')
+        with mock.patch.object(
+            db_router.random, 'choice', return_value='default'
+        ) as choice:
+            response = self.client.get(
+                reverse('posts:profile_follow', args=[author.username]),
+                follow=True,
+            )
+            self.assertFalse(choice.called)
+        self.assertIn(PIN_COOKIE, response.client.cookies)
+
+
+class SyncReplicasTest(TestCase):
+    def test_copy_takes_consistent_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'db.sqlite3')
+            target = os.path.join(directory, 'db.replica1.sqlite3')
+            with sqlite3.connect(source) as connection:
+                connection.execute('CREATE TABLE item (name TEXT)')
+                connection.execute("INSERT INTO item VALUES ('первый')")
+            connection.close()
+            copy(source, target)
+            with sqlite3.connect(source) as connection:
+                connection.execute("INSERT INTO item VALUES ('второй')")
+            connection.close()
+            replica = sqlite3.connect(target)
+            rows = replica.execute('SELECT name FROM item').fetchall()
+            replica.close()
+            self.assertEqual(rows, [('первый',)])
+            self.assertFalse(os.path.exists(f'{target}.tmp'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_command_requires_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas')
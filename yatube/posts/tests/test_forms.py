@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -86,12 +87,14 @@ class PostFormTests(TestCase):
             follow=True
         )
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        # Хранилище называет файл по хешу содержимого.
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст',
                 group=self.group.id,
                 author=self.user,
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).exists())
 
     def test_edit_post_form(self):
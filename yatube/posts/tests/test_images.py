@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (Client, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from PIL import Image
+
+from core import imaging
+from posts import images
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+ORIENTATION = 0x0112
+
+
+def make_image(size=(400, 200), mode='RGB', fmt='PNG', exif=None):
+    buffer = BytesIO()
+    image = Image.new(mode, size, color='red')
+    if exif is None:
+        image.save(buffer, fmt)
+    else:
+        image.save(buffer, fmt, exif=exif)
+    return buffer.getvalue()
+
+
+def upload(data, name='upload.png'):
+    return SimpleUploadedFile(name, data, 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIZE=100)
+class ImageIngestionTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'),
+                      ignore_errors=True)
+        self.user = User.objects.create_user(username='HasNoName')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, data, name='upload.png'):
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Текст', 'image': upload(data, name)},
+        )
+        return Post.objects.get()
+
+    def stored_files(self):
+        found = []
+        root = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        for dirpath, _, filenames in os.walk(root):
+            found.extend(
+                os.path.relpath(os.path.join(dirpath, filename),
+                                TEMP_MEDIA_ROOT)
+                for filename in filenames
+            )
+        return found
+
+    def test_upload_is_downscaled_and_reencoded(self):
+        """Картинка уменьшается, перекодируется в JPEG, оригинал удаляется"""
+        post = self.create(make_image((400, 200)))
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        self.assertEqual(self.stored_files(), [post.image.name])
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (100, 50))
+
+    def test_exif_is_applied_and_stripped(self):
+        """Поворот из EXIF применяется, сами метаданные не сохраняются"""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        post = self.create(
+            make_image((80, 40), fmt='JPEG', exif=exif), 'upload.jpg'
+        )
+        self.assertEqual((post.image_width, post.image_height), (40, 80))
+        with Image.open(post.image.path) as stored:
+            self.assertNotIn('exif', stored.info)
+
+    def test_small_image_is_not_upscaled(self):
+        post = self.create(make_image((30, 20), mode='RGBA'))
+        self.assertEqual((post.image_width, post.image_height), (30, 20))
+
+    @override_settings(IMAGE_MAX_PIXELS=100 * 100)
+    def test_decompression_bomb_is_rejected_by_form(self):
+        """Картинку с огромным разрешением форма не принимает"""
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Текст', 'image': upload(make_image((200, 200)))},
+        )
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(response.context['form'].errors['image'])
+
+    def test_edit_resets_size_until_ingested(self):
+        post = self.create(make_image((400, 200)))
+        self.client.post(
+            reverse('posts:post_edit', args=[post.id]),
+            {'text': 'Текст', 'image-clear': 'on'},
+        )
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertIsNone(post.image_width)
+
+    def test_replaced_image_is_left_alone(self):
+        """Задача по устаревшему имени картинки ничего не делает"""
+        post = self.create(make_image())
+        name = post.image.name
+        images.ingest_image(post.pk, 'posts/old.png')
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(self.stored_files(), [name])
+
+
+class ReencodeTest(SimpleTestCase):
+    def test_transparency_is_flattened_on_white(self):
+        image = Image.new('RGBA', (10, 10), (0, 0, 0, 0))
+        self.assertEqual(imaging.flatten(image).getpixel((0, 0)),
+                         (255, 255, 255))
+
+    def test_bomb_is_rejected_before_decoding(self):
+        with self.assertRaises(imaging.ImageTooLarge):
+            imaging.reencode(make_image((200, 200)), 100, 80, 100 * 100)
+
+    @override_settings(IMAGE_PROCESSES=1, IMAGE_MAX_SIZE=100)
+    def test_reencode_in_process_pool(self):
+        """Перекодирование выполняется в отдельном процессе"""
+        try:
+            content, width, height = images.reencode(make_image((400, 200)))
+        finally:
+            images._reset_pool()
+        self.assertEqual((width, height), (100, 50))
+        self.assertTrue(content.startswith(b'\xff\xd8'))
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage, is_content_name
+from core import page_cache
+from posts import feed_cache, thumbnails
+from posts.models import ImageVariants, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), color=color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def files_under(directory):
+    found = []
+    for dirpath, _, filenames in os.walk(
+        os.path.join(TEMP_MEDIA_ROOT, directory)
+    ):
+        found.extend(filenames)
+    return found
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for directory in ('cache', 'posts'):
+            shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, directory),
+                          ignore_errors=True)
+        thumbnails.clear_local()
+        self.storage = ContentAddressedStorage()
+        self.author = User.objects.create_user(username='author')
+
+    def test_file_is_named_by_content_hash(self):
+        data = image_bytes()
+        name = self.storage.save('posts/photo.PNG', ContentFile(data))
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(name, f'posts/{digest[:2]}/{digest}.png')
+        self.assertEqual(files_under('posts'), [f'{digest}.png'])
+
+    def test_identical_uploads_are_stored_once(self):
+        """Одинаковый файл хранится один раз, ссылки считаются"""
+        first = self.storage.save('posts/a.png', ContentFile(image_bytes()))
+        second = self.storage.save('posts/b.png', ContentFile(image_bytes()))
+        self.assertEqual(first, second)
+        self.assertEqual(len(files_under('posts')), 1)
+        self.assertEqual(self.storage.references(first), 2)
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.assertEqual(self.storage.references(first), 1)
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_untracked_file_is_not_deleted(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'old.png')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(image_bytes())
+        self.storage.delete('posts/old.png')
+        self.assertTrue(os.path.exists(path))
+
+    def test_posts_share_file_and_thumbnails(self):
+        """Посты с одной картинкой делят файл и миниатюры"""
+        posts = [
+            Post.objects.create(
+                text='Пост', author=self.author,
+                image=ContentFile(image_bytes(), name='photo.png'),
+            )
+            for _ in range(2)
+        ]
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        for post in posts:
+            thumbnails.generate(post.image)
+        self.assertEqual(
+            len(files_under('cache')), len(thumbnails.VARIANTS)
+        )
+        name = posts[0].image.name
+        posts[0].delete()
+        self.assertTrue(self.storage.exists(name))
+        posts[1].delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_last_reference_removes_thumbnails(self):
+        """С последней ссылкой удаляются миниатюры, строка и запись LRU"""
+        name = self.storage.save('posts/a.png', ContentFile(image_bytes()))
+        thumbnails.generate(name)
+        self.assertTrue(ImageVariants.objects.filter(source=name).exists())
+        self.storage.delete(name)
+        self.assertEqual(files_under('cache'), [])
+        self.assertFalse(ImageVariants.objects.exists())
+        self.assertIsNone(thumbnails._local.get(name))
+
+    def test_replaced_image_is_released(self):
+        post = Post.objects.create(
+            text='Пост', author=self.author,
+            image=ContentFile(image_bytes('red'), name='red.png'),
+        )
+        old = post.image.name
+        post.image = ContentFile(image_bytes('blue'), name='blue.png')
+        post.save()
+        self.assertFalse(self.storage.exists(old))
+        self.assertTrue(self.storage.exists(post.image.name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DedupeMediaTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'),
+                      ignore_errors=True)
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        author = User.objects.create_user(username='author')
+        contents = {
+            'a.png': image_bytes('red'),
+            'b.png': image_bytes('red'),
+            'c.png': image_bytes('blue'),
+        }
+        for name, data in contents.items():
+            with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', name),
+                      'wb') as file:
+                file.write(data)
+        # Старые посты: сохраняются в обход хранилища, как до переноса.
+        Post.objects.bulk_create(
+            Post(text=name, author=author, image=f'posts/{name}')
+            for name in ('a.png', 'a.png', 'b.png', 'c.png')
+        )
+
+    def test_duplicates_are_merged(self):
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('дубликатов удалено: 1', out.getvalue())
+        names = dict(Post.objects.values_list('text', 'image'))
+        self.assertEqual(names['a.png'], names['b.png'])
+        self.assertNotEqual(names['a.png'], names['c.png'])
+        self.assertTrue(all(map(is_content_name, names.values())))
+        self.assertEqual(len(files_under('posts')), 2)
+        self.assertEqual(
+            dict(StoredFile.objects.values_list('name', 'references')),
+            {names['a.png']: 3, names['c.png']: 1},
+        )
+
+    def test_cached_pages_are_invalidated(self):
+        """Перенос в обход сигналов всё равно сбрасывает кэш страниц"""
+        feed_version = feed_cache.get_version(feed_cache.INDEX)
+        page_version = page_cache.get_version()
+        call_command('dedupe_media', stdout=StringIO())
+        self.assertNotEqual(
+            feed_cache.get_version(feed_cache.INDEX), feed_version
+        )
+        self.assertNotEqual(page_cache.get_version(), page_version)
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('dedupe_media', dry_run=True, stdout=out)
+        self.assertIn('дубликатов удалено: 1', out.getvalue())
+        self.assertEqual(
+            sorted(files_under('posts')), ['a.png', 'b.png', 'c.png']
+        )
+        self.assertFalse(StoredFile.objects.exists())
@@ -0,0 +1,152 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.page_cache import split_holes
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+HOLES = {'includes/header.html', 'posts/includes/switcher.html'}
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            text='Первый пост', author=self.author, group=self.group
+        )
+        cache.clear()
+        self.guest = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_anonymous_hit_skips_database(self):
+        """Повторная страница для анонима отдаётся без запросов к БД"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('about:author'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.guest.get(url)
+                self.assertEqual(len(queries), 0)
+                self.assertEqual(
+                    [template.name for template in second.templates
+                     if template.name not in HOLES],
+                    [],
+                )
+                self.assertEqual(second.content, first.content)
+
+    def test_query_string_is_part_of_key(self):
+        """Разные query string кэшируются отдельно"""
+        url = reverse('posts:index')
+        self.guest.get(url)
+        response = self.guest.get(url + '?page=1')
+        self.assertTemplateUsed(response, 'posts/index.html')
+
+    def test_logged_in_user_gets_own_header(self):
+        """Вошедший получает общую страницу со своей шапкой"""
+        url = reverse('posts:index')
+        self.guest.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/index.html')
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'Избранные авторы')
+        self.assertContains(response, 'Первый пост')
+        self.assertFalse(any(
+            'posts_post' in query['sql'] for query in queries
+        ))
+        guest_page = self.guest.get(url)
+        self.assertNotContains(guest_page, 'Пользователь:')
+        self.assertNotContains(guest_page, 'Избранные авторы')
+
+    def test_personal_pages_bypass_cache_for_users(self):
+        """Профиль для вошедшего рендерится заново"""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.guest.get(url)
+        response = self.reader_client.get(url)
+        self.assertTemplateUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Подписаться')
+
+    def test_page_rendered_before_commit_is_not_kept(self):
+        """Страница, отрендеренная между записью и коммитом, не остаётся"""
+        url = reverse('posts:index')
+        responses = []
+
+        def fetch():
+            try:
+                responses.append(Client().get(url))
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            Post.objects.create(text='Свежий пост', author=self.author)
+            # Соединение другого потока ещё не видит незакоммиченный пост.
+            reader = threading.Thread(target=fetch)
+            reader.start()
+            reader.join()
+            self.assertNotContains(responses[0], 'Свежий пост')
+        self.assertContains(self.guest.get(url), 'Свежий пост')
+
+    def test_signals_invalidate_pages(self):
+        """Посты, комментарии и группы сбрасывают кэш страниц"""
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        group = reverse('posts:group_list', args=[self.group.slug])
+        for url in (index, detail, group):
+            self.guest.get(url)
+        Post.objects.create(text='Второй пост', author=self.author)
+        self.assertContains(self.guest.get(index), 'Второй пост')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Свежий коммент'
+        )
+        self.assertContains(self.guest.get(detail), 'Свежий коммент')
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.guest.get(group), 'Новое название')
+
+    def test_revalidation_from_cache(self):
+        """Аноним с актуальным ETag получает 304 прямо из кэша"""
+        url = reverse('posts:index')
+        response = self.guest.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            repeated = self.guest.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+    def test_detail_for_guest_has_no_comment_form(self):
+        """Аноним не видит формы комментария, страница без кук"""
+        response = self.guest.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        self.assertNotContains(response, 'Добавить комментарий')
+        self.assertFalse(response.cookies)
+
+
+class HolesTest(TestCase):
+    def test_split_holes(self):
+        """Фрагменты между маркерами заменяются дырками"""
+        segments = split_holes(
+            'a<!--hole:includes/header.html-->шапка<!--/hole-->b'
+        )
+        self.assertEqual(segments, [
+            ('text', 'a'), ('hole', 'includes/header.html'), ('text', 'b')
+        ])
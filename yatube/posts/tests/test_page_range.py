@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.templatetags.pagination import ELLIPSIS, elided_page_range
+from posts.models import Group, Post
+from posts.paginators import ApproximatePaginator
+
+User = get_user_model()
+
+
+def page(number, count, per_page=1):
+    return Paginator(range(count), per_page).page(number)
+
+
+class ElidedPageRangeTest(TestCase):
+    def test_few_pages_are_listed(self):
+        """Немного страниц выводятся все"""
+        self.assertEqual(elided_page_range(page(2, 5)), [1, 2, 3, 4, 5])
+
+    def test_middle_page(self):
+        """Вокруг текущей окно, по краям первая и последняя"""
+        self.assertEqual(
+            elided_page_range(page(50, 100)),
+            [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 100],
+        )
+
+    def test_edges(self):
+        self.assertEqual(
+            elided_page_range(page(1, 100)), [1, 2, 3, ELLIPSIS, 100]
+        )
+        self.assertEqual(
+            elided_page_range(page(100, 100)), [1, ELLIPSIS, 98, 99, 100]
+        )
+
+    def test_template_size_does_not_grow(self):
+        """Число ссылок в пагинаторе не зависит от числа страниц"""
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=author, group=group)
+            for i in range(300)
+        )
+        response = Client().get(
+            reverse('posts:group_list', args=[group.slug]), {'page': 15}
+        )
+        content = response.content.decode()
+        self.assertIn(ELLIPSIS, content)
+        self.assertIn('?page=30', content)
+        self.assertNotIn('?page=20"', content)
+        self.assertLess(content.count('class="page-item'), 15)
+
+
+@override_settings(PAGINATOR_EXACT_COUNT_LIMIT=20)
+class ApproximatePaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author) for i in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_known_estimate_skips_count(self):
+        """Готовый счётчик заменяет COUNT(*)"""
+        paginator = ApproximatePaginator(
+            Post.objects.all(), 10, estimate=1000
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, 100)
+
+    def test_small_estimate_is_counted_exactly(self):
+        """Малые выборки считаются точно"""
+        paginator = ApproximatePaginator(Post.objects.all(), 10, estimate=5)
+        self.assertEqual(paginator.count, 30)
+
+    def test_table_estimate_for_unfiltered_queryset(self):
+        """Выборка без фильтров оценивается по таблице, без COUNT(*)"""
+        paginator = ApproximatePaginator(Post.objects.all(), 10)
+        self.assertGreaterEqual(paginator.count, 30)
+        with self.assertNumQueries(0):
+            ApproximatePaginator(Post.objects.all(), 10).count
+
+    def test_filtered_count_is_cached(self):
+        """COUNT(*) большой выборки с фильтром кэшируется"""
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(ApproximatePaginator(posts, 10).count, 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(ApproximatePaginator(posts, 10).count, 30)
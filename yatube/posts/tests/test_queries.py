@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.query_budget import (QueryBudgetExceeded, QueryBudgetMiddleware,
+                               query_budget)
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetViewsTest(TestCase):
+    """Страницы укладываются в бюджет при любом числе постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test', slug='test')
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{i}', first_name='Имя', last_name=str(i)
+            )
+            for i in range(12)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(text='Текст', author=author, group=cls.group)
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=author, text='Коммент')
+            for author in cls.authors
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_pages_fit_query_budget(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.authors[0].username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_comments_fragment_for_logged_in_user(self):
+        """
+        Фрагмент комментариев: сессия и пользователь, состояние поста
+        для валидаторов (оно же проверка, что пост есть) и страница
+        комментариев
+        """
+        url = reverse('posts:post_comments', args=[self.post.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 4)
+
+    def test_list_queries_do_not_grow_with_posts(self):
+        """Число запросов главной не зависит от числа постов на ней"""
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        Post.objects.bulk_create([
+            Post(text='Ещё', author=author, group=self.group)
+            for author in self.authors
+        ])
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(before), len(after))
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    @staticmethod
+    def greedy_view(request):
+        list(User.objects.all())
+        list(User.objects.all())
+        return HttpResponse()
+
+    def run_view(self, budget):
+        view = query_budget(budget)(self.greedy_view)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        return middleware(self.request)
+
+    def test_within_budget(self):
+        self.assertEqual(self.run_view(2).status_code, 200)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_over_budget_fails_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.run_view(1)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('core.query_budget', 'WARNING'):
+            self.run_view(1)
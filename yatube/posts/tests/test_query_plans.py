@@ -0,0 +1,132 @@
+import re
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход таблицы: SCAN без индекса.
+FULL_SCAN = re.compile(r'^SCAN (?!.*\bINDEX\b)')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def explain(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN')
+class QueryPlanTest(TestCase):
+    """Горячие запросы страниц идут по индексам и без сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='test', slug='test')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.reader, text='Коммент')
+            for _ in range(5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url):
+        """Планы всех SELECT страницы и её второй страницы по курсору."""
+        response = self.client.get(url)
+        urls = [url]
+        page_obj = response.context.get('page_obj')
+        if page_obj is not None and page_obj.next_cursor:
+            urls.append(f'{url}?cursor={page_obj.next_cursor}')
+        plans = []
+        for page_url in urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(page_url)
+            plans += [
+                (query['sql'], explain(query['sql']))
+                for query in queries.captured_queries
+                if query['sql'].startswith('SELECT')
+            ]
+        return plans
+
+    def assertIndexedPlans(self, plans):
+        for sql, plan in plans:
+            for step in plan:
+                with self.subTest(sql=sql, step=step):
+                    self.assertIsNone(FULL_SCAN.match(step))
+                    self.assertNotIn(TEMP_SORT, step)
+
+    def assertUsesIndex(self, plans, index):
+        steps = [step for _, plan in plans for step in plan]
+        self.assertTrue(
+            any(index in step for step in steps),
+            f'{index} is not used: {steps}',
+        )
+
+    def test_index(self):
+        """Главная страница читается по индексу даты"""
+        self.assertIndexedPlans(self.plans(reverse('posts:index')))
+
+    def test_group_list(self):
+        """Лента группы идёт по индексу (group, -pub_date, -id)"""
+        plans = self.plans(
+            reverse('posts:group_list', args=[self.group.slug])
+        )
+        self.assertIndexedPlans(plans)
+        self.assertUsesIndex(plans, 'post_group_pub_date_idx')
+
+    def test_profile(self):
+        """Профиль идёт по индексу (author, -pub_date, -id)"""
+        plans = self.plans(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertIndexedPlans(plans)
+        self.assertUsesIndex(plans, 'post_author_pub_date_idx')
+
+    def test_post_detail(self):
+        """Комментарии поста читаются по индексу в порядке создания"""
+        plans = self.plans(reverse('posts:post_detail', args=[self.post.id]))
+        self.assertIndexedPlans(plans)
+        self.assertUsesIndex(plans, 'comment_post_created_idx')
+
+    def test_rankings(self):
+        """Популярное и тренды идут по индексам рейтингов"""
+        for name in ('popular', 'trending'):
+            with self.subTest(name=name):
+                plans = self.plans(reverse(f'posts:{name}'))
+                self.assertIndexedPlans(plans)
+                self.assertUsesIndex(plans, f'post_{name}_idx')
+
+    def test_follow_index(self):
+        """Лента подписок идёт по индексу (user, -pub_date, -post)"""
+        plans = self.plans(reverse('posts:follow_index'))
+        self.assertIndexedPlans(plans)
+        self.assertUsesIndex(plans, 'timeline_user_pub_date_idx')
+
+    def test_followers_lookup(self):
+        """Подписчики автора (раскладка ленты) ищутся по индексу"""
+        queryset = Follow.objects.filter(author=self.author).values('user')
+        plan = explain(*queryset.query.sql_with_params())
+        self.assertIndexedPlans([(str(queryset.query), plan)])
+        self.assertUsesIndex(
+            [(None, plan)], 'follow_author_user_idx'
+        )
@@ -0,0 +1,150 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import ranking
+from posts.models import Comment, Post, RankingEpoch
+
+User = get_user_model()
+
+
+class RankingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.old, cls.fresh, cls.quiet = [
+            Post.objects.create(text=text, author=cls.author)
+            for text in ('Старый', 'Свежий', 'Тихий')
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def feed(self, name):
+        response = self.client.get(reverse(f'posts:{name}'))
+        return list(response.context['page_obj'])
+
+    def scores(self, post):
+        return Post.objects.values_list(
+            'popular_score', 'trending_score'
+        ).get(pk=post.pk)
+
+    def discuss(self, post, count, ago):
+        moment = timezone.now() - ago
+        for _ in range(count):
+            ranking.add(post.pk, ranking.COMMENT_WEIGHT, moment)
+
+    def test_comment_raises_post(self):
+        """Комментарий поднимает пост в обеих лентах"""
+        Comment.objects.create(post=self.quiet, author=self.author, text='!')
+        self.assertEqual(self.feed('popular')[0], self.quiet)
+        self.assertEqual(self.feed('trending')[0], self.quiet)
+
+    def test_deleted_comment_is_subtracted(self):
+        before = self.scores(self.quiet)
+        comment = Comment.objects.create(
+            post=self.quiet, author=self.author, text='!'
+        )
+        comment.delete()
+        for score, expected in zip(self.scores(self.quiet), before):
+            self.assertAlmostEqual(score, expected)
+
+    def test_scores_decay(self):
+        """Старое обсуждение быстро уходит из трендов, но не из популярного"""
+        self.discuss(self.old, 5, timedelta(days=3))
+        self.discuss(self.fresh, 2, timedelta(hours=1))
+        self.assertEqual(self.feed('popular')[0], self.old)
+        self.assertEqual(self.feed('trending')[0], self.fresh)
+
+    def test_feed_does_not_aggregate_comments(self):
+        """Лента не читает таблицу комментариев"""
+        self.discuss(self.fresh, 2, timedelta(hours=1))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:trending'))
+
+    def test_rebase_keeps_order(self):
+        """Сдвиг точки отсчёта уменьшает рейтинги, не меняя порядок"""
+        self.discuss(self.old, 5, timedelta(days=3))
+        self.discuss(self.fresh, 2, timedelta(hours=1))
+        before = {
+            name: self.feed(name) for name in ('popular', 'trending')
+        }
+        scores = self.scores(self.fresh)
+        epoch = ranking.rebase(timezone.now() + timedelta(days=1))
+        self.assertEqual(RankingEpoch.objects.get().epoch, epoch)
+        for old, new in zip(scores, self.scores(self.fresh)):
+            self.assertLess(new, old)
+        for name, posts in before.items():
+            cache.clear()
+            self.assertEqual(self.feed(name), posts)
+
+    def test_rebuild_matches_incremental_scores(self):
+        """Пересчёт с нуля даёт те же рейтинги, что и сигналы"""
+        for _ in range(3):
+            Comment.objects.create(post=self.fresh, author=self.author,
+                                   text='!')
+        ranking.rebase()
+        expected = {
+            post.pk: self.scores(post)
+            for post in (self.old, self.fresh, self.quiet)
+        }
+        call_command('refresh_rankings', rebuild=True, stdout=io.StringIO())
+        for pk, scores in expected.items():
+            for score, value in zip(self.scores(Post(pk=pk)), scores):
+                self.assertAlmostEqual(score, value, places=4)
+
+    def test_batched_rebase(self):
+        """Сдвиг по одному посту в транзакции делит все рейтинги"""
+        self.discuss(self.old, 5, timedelta(days=3))
+        self.discuss(self.fresh, 2, timedelta(hours=1))
+        epoch = RankingEpoch.objects.get().epoch
+        moment = timezone.now() + timedelta(days=1)
+        before = {post: self.scores(post) for post in (self.old, self.fresh)}
+        self.assertEqual(ranking.rebase(moment, batch_size=1), moment)
+        row = RankingEpoch.objects.get()
+        self.assertIsNone(row.next_epoch)
+        self.assertIsNone(row.rebased_to)
+        for post, scores in before.items():
+            for name, old, new in zip(('popular', 'trending'), scores,
+                                      self.scores(post)):
+                factor = ranking.growth(ranking.RANKINGS[name], moment, epoch)
+                self.assertAlmostEqual(new, old / factor)
+
+    def test_event_during_rebase(self):
+        """Событие посреди сдвига считается от точки отсчёта своего поста"""
+        # Посты созданы в разные моменты: уравниваем их историю.
+        Post.objects.update(popular_score=0, trending_score=0)
+        now = timezone.now()
+        for post in (self.old, self.fresh):
+            ranking.add(post.pk, ranking.COMMENT_WEIGHT,
+                        now - timedelta(hours=2))
+        moment = now + timedelta(days=1)
+        batch = ranking._rebase_batch
+        calls = []
+
+        def interrupted(batch_size):
+            if calls:
+                raise DatabaseError
+            calls.append(batch_size)
+            return batch(batch_size)
+
+        with mock.patch.object(ranking, '_rebase_batch', interrupted):
+            with self.assertRaises(DatabaseError):
+                ranking.rebase(moment, batch_size=1)
+        # Первый пост уже на новой точке отсчёта, второй — ещё нет.
+        self.assertEqual(RankingEpoch.objects.get().rebased_to, self.old.pk)
+        for post in (self.old, self.fresh):
+            ranking.add(post.pk, ranking.COMMENT_WEIGHT, now)
+        self.assertEqual(ranking.rebase(), moment)
+        for old, fresh in zip(self.scores(self.old), self.scores(self.fresh)):
+            self.assertAlmostEqual(old, fresh)
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.strong = Post.objects.create(
+            text='Котики, котики и ещё раз котики',
+            author=cls.user,
+        )
+        cls.weak = Post.objects.create(
+            text='Длинный рассказ про погоду, где один раз мелькают котики '
+                 'и много прочих слов о дожде, ветре и облаках',
+            author=cls.user,
+        )
+        cls.other = Post.objects.create(text='Про собак', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def results(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response, list(response.context['page_obj'])
+
+    def test_results_are_ranked(self):
+        """Более релевантный пост выше, неподходящие не найдены"""
+        _, posts = self.results('котики')
+        self.assertEqual(posts, [self.strong, self.weak])
+
+    def test_prefix_match(self):
+        """Последнее слово запроса ищется по префиксу"""
+        _, posts = self.results('соба')
+        self.assertEqual(posts, [self.other])
+
+    def test_operators_do_not_break_query(self):
+        """Спецсимволы FTS в запросе не приводят к ошибке"""
+        response, posts = self.results('"котики" OR (NEAR')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(posts, [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения подсвечены, а HTML из текста экранирован"""
+        post = Post.objects.create(
+            text='<script>alert(1)</script> хомяк', author=self.user
+        )
+        response, posts = self.results('хомяк')
+        self.assertEqual(posts, [post])
+        self.assertIn('<mark>хомяк</mark>', posts[0].snippet)
+        self.assertNotContains(response, '<script>')
+
+    def test_cursor_pages(self):
+        """Выдача листается курсором по рангу"""
+        paginator = search.SearchPaginator('котики', per_page=1)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual(list(first), [self.strong])
+        self.assertEqual(list(second), [self.weak])
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual(list(back), [self.strong])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Индекс синхронизирован с изменением и удалением постов"""
+        post = Post.objects.create(text='Попугай', author=self.user)
+        post.text = 'Черепаха'
+        post.save()
+        self.assertEqual(self.results('попугай')[1], [])
+        self.assertEqual(self.results('черепаха')[1], [post])
+        post.delete()
+        self.assertEqual(self.results('черепаха')[1], [])
+
+    def test_empty_query(self):
+        """Пустой запрос не выполняет поиск"""
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.strong, self.weak},
+        )
@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core import sqlite
+from core.management.commands.sync_replicas import copy
+
+
+class SqlitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_configured(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS"""
+        # synchronous=NORMAL — 1, temp_store=MEMORY — 2.
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        self.assertEqual(self.pragma('cache_size'), -32 * 1024)
+
+    def test_replica_keeps_journal_mode(self):
+        """На репликах PRAGMA, меняющие файл базы, не выполняются"""
+        replica = mock.MagicMock(vendor='sqlite', alias='replica1',
+                                 settings_dict={})
+        cursor = replica.cursor.return_value.__enter__.return_value
+        with self.settings(DATABASE_REPLICAS=['replica1']):
+            sqlite.configure(sender=None, connection=replica)
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertIn('PRAGMA synchronous = normal', statements)
+        self.assertNotIn('PRAGMA journal_mode = wal', statements)
+
+
+class ImmediateTransactionTest(SimpleTestCase):
+    alias = 'immediate'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.databases[self.alias] = {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'PRAGMAS': {'journal_mode': 'wal', 'busy_timeout': 0},
+        }
+        self.addCleanup(connections.databases.pop, self.alias)
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(connections[self.alias].close)
+
+    def test_transaction_takes_write_lock_at_begin(self):
+        """atomic() сразу берёт блокировку записи: второй писатель ждёт"""
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        other = sqlite3.connect(connections.databases[self.alias]['NAME'],
+                                timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with transaction.atomic(using=self.alias):
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM item')
+            with self.assertRaises(sqlite3.OperationalError):
+                other.execute('BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+
+class HealthTest(TestCase):
+    def test_healthy(self):
+        response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertTrue(data['databases']['default']['ok'])
+        self.assertIn('journal_mode', data['databases']['default'])
+
+    def test_database_error(self):
+        """Упавшая база — 503 без текста ошибки в ответе"""
+        with mock.patch('core.views.journal_mode',
+                        side_effect=DatabaseError('disk I/O error')):
+            with self.assertLogs('core.views', 'ERROR'):
+                response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertNotIn('disk', response.content.decode())
+
+
+class SqliteFilesTest(SimpleTestCase):
+    def test_replica_copy_is_not_wal(self):
+        """Копия WAL-базы для реплики — в обычном журнале, без -wal"""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'db.sqlite3')
+            target = os.path.join(directory, 'db.replica1.sqlite3')
+            database = sqlite3.connect(source)
+            database.execute('PRAGMA journal_mode = wal')
+            database.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+            database.commit()
+            copy(source, target)
+            database.close()
+            replica = sqlite3.connect(target)
+            mode = replica.execute('PRAGMA journal_mode').fetchone()[0]
+            replica.close()
+            self.assertEqual(mode, 'delete')
+            self.assertFalse(os.path.exists(f'{target}-wal'))
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', duration=0.2, readers=2,
+                     writers=2, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {'default', 'production'})
+        for profile in results.values():
+            self.assertGreater(profile['reads']['per_second'], 0)
+            self.assertGreater(profile['writes']['per_second'], 0)
+        # Запись после чтения ждёт блокировку, а не падает.
+        self.assertEqual(results['production']['writes']['locked'], 0)
@@ -0,0 +1,163 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+
+from core import stampede
+from core.stampede import cache_view, get_or_compute
+
+
+class Counter:
+    def __init__(self, value='value'):
+        self.calls = 0
+        self.value = value
+
+    def __call__(self):
+        self.calls += 1
+        return f'{self.value}{self.calls}'
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def expire(self, key, delta=0.0):
+        """Делает значение просроченным, но ещё хранимым"""
+        value, _, _ = cache.get(key)
+        cache.set(key, (value, delta, time.time() - 1), 60)
+
+    def test_fresh_value_is_reused(self):
+        """Свежее значение не пересчитывается"""
+        compute = Counter()
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 1)
+
+    def test_expired_value_is_recomputed(self):
+        """Просроченное значение пересчитывает получивший блокировку"""
+        compute = Counter()
+        get_or_compute('key', compute, 60)
+        self.expire('key')
+        self.assertEqual(get_or_compute('key', compute, 60), 'value2')
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_stale_value_while_locked(self):
+        """Пока другой воркер пересчитывает, отдаётся старое значение"""
+        compute = Counter()
+        get_or_compute('key', compute, 60)
+        self.expire('key')
+        cache.add('key:lock', True)
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 1)
+
+    def test_early_recomputation(self):
+        """Долгий пересчёт начинается до истечения срока"""
+        compute = Counter()
+        get_or_compute('key', compute, 60)
+        value, _, _ = cache.get('key')
+        cache.set('key', (value, 10.0, time.time() + 5), 60)
+        with mock.patch.object(stampede.random, 'random', return_value=0.9):
+            self.assertEqual(get_or_compute('key', compute, 60), 'value2')
+        value, _, _ = cache.get('key')
+        cache.set('key', (value, 10.0, time.time() + 5), 60)
+        with mock.patch.object(stampede.random, 'random', return_value=0.0):
+            self.assertEqual(get_or_compute('key', compute, 60), 'value2')
+
+    @mock.patch.object(stampede, 'COLD_WAIT', 0.1)
+    def test_cold_miss_waits_for_other_worker(self):
+        """При холодном промахе под блокировкой ждём и считаем сами"""
+        compute = Counter()
+        cache.add('key:lock', True)
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 1)
+
+
+class FragmentCacheTagTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fragment_is_cached_per_vary_on(self):
+        """Тег кэширует фрагмент отдельно для каждого vary_on"""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% fragment_cache 60 block key %}{{ value }}'
+            '{% endfragment_cache %}'
+        )
+        self.assertEqual(template.render(Context({'key': 1, 'value': 'a'})),
+                         'a')
+        self.assertEqual(template.render(Context({'key': 1, 'value': 'b'})),
+                         'a')
+        self.assertEqual(template.render(Context({'key': 2, 'value': 'b'})),
+                         'b')
+
+
+class CacheViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, path='/page/'):
+        request = self.factory.get(path)
+        request.user = mock.Mock(pk=None)
+        return request
+
+    def test_view_response_is_cached(self):
+        """Ответ 200 кэшируется, ошибки — нет"""
+        calls = []
+
+        @cache_view(60)
+        def view(request):
+            calls.append(request.path)
+            status = 404 if request.path == '/missing/' else 200
+            return HttpResponse(f'{len(calls)}', status=status)
+
+        self.assertEqual(view(self.request()).content, b'1')
+        self.assertEqual(view(self.request()).content, b'1')
+        self.assertEqual(view(self.request('/missing/')).status_code, 404)
+        self.assertEqual(view(self.request('/missing/')).status_code, 404)
+        self.assertEqual(len(calls), 3)
+
+    def test_visitor_specific_responses_are_not_cached(self):
+        """Ответы с куками, Vary: Cookie и токеном CSRF не кэшируются"""
+        def with_cookie(response, request):
+            response.set_cookie('pin', '1')
+
+        def with_vary(response, request):
+            response['Vary'] = 'Cookie'
+
+        def with_csrf(response, request):
+            request.META['CSRF_COOKIE_USED'] = True
+
+        for personalize in (with_cookie, with_vary, with_csrf):
+            with self.subTest(personalize=personalize.__name__):
+                cache.clear()
+                calls = []
+
+                @cache_view(60)
+                def view(request):
+                    calls.append(1)
+                    response = HttpResponse('page')
+                    personalize(response, request)
+                    return response
+
+                view(self.request())
+                view(self.request())
+                self.assertEqual(len(calls), 2)
+
+    def test_version_is_part_of_key(self):
+        """Новая версия данных — новый ключ"""
+        version = mock.Mock(return_value=1)
+        calls = []
+
+        @cache_view(60, version=version)
+        def view(request):
+            calls.append(1)
+            return HttpResponse(f'{len(calls)}')
+
+        self.assertEqual(view(self.request()).content, b'1')
+        self.assertEqual(view(self.request()).content, b'1')
+        version.return_value = 2
+        self.assertEqual(view(self.request()).content, b'2')
@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import ImageVariants, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), color=(200, 0, 0)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def thumbnail_files():
+    found = []
+    for _, _, filenames in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'cache')):
+        found.extend(filenames)
+    return found
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for directory in ('cache', 'posts'):
+            shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, directory),
+                          ignore_errors=True)
+        thumbnails.clear_local()
+
+    def test_post_create_generates_thumbnails(self):
+        """Миниатюра строится при публикации, до первого просмотра"""
+        user = User.objects.create_user(username='HasNoName')
+        client = Client()
+        client.force_login(user)
+        client.post(
+            reverse('posts:post_create'),
+            {'text': 'Текст', 'image': make_image()},
+        )
+        self.assertEqual(len(thumbnail_files()), len(thumbnails.VARIANTS))
+
+    def test_warm_thumbnails_command(self):
+        """warm_thumbnails обходит media/posts/ и строит миниатюры"""
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        for name in ('one.png', 'two.png'):
+            path = os.path.join(TEMP_MEDIA_ROOT, 'posts', name)
+            with open(path, 'wb') as file:
+                file.write(make_image(name).read())
+        out = StringIO()
+        call_command('warm_thumbnails', workers=2, stdout=out)
+        self.assertIn('[2/2]', out.getvalue())
+        self.assertEqual(
+            len(thumbnail_files()), 2 * len(thumbnails.VARIANTS)
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ResponsiveImageTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        thumbnails.clear_local()
+        author = User.objects.create_user(username='author')
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=author,
+                image=ContentFile(make_image().read(), name='photo.png'),
+            )
+            for i in range(2)
+        ]
+
+    def test_feed_image_has_srcset_and_size(self):
+        """Картинка ленты — набор ширин с размерами, ниже первой — лениво"""
+        content = Client().get(reverse('posts:index')).content.decode()
+        self.assertEqual(content.count('<picture>'), 2)
+        for width in thumbnails.WIDTHS:
+            self.assertIn(f' {width}w', content)
+        self.assertIn('width="960" height="339"', content)
+        self.assertEqual(content.count('loading="lazy"'), 1)
+
+    def test_post_detail_image_is_not_lazy(self):
+        url = reverse('posts:post_detail', args=[self.posts[0].id])
+        content = Client().get(url).content.decode()
+        self.assertIn('<picture>', content)
+        self.assertNotIn('loading="lazy"', content)
+
+    @skipUnless('WEBP' in thumbnails.FORMATS, 'Pillow собран без WebP')
+    def test_webp_source_comes_first(self):
+        content = Client().get(reverse('posts:index')).content.decode()
+        self.assertIn('<source type="image/webp"', content)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailResolutionTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        thumbnails.clear_local()
+        author = User.objects.create_user(username='author')
+        self.names = []
+        for i in range(10):
+            buffer = BytesIO()
+            Image.new('RGB', (40, 30), color=(i * 20, 0, 0)).save(
+                buffer, 'PNG'
+            )
+            post = Post.objects.create(
+                text=f'Пост {i}', author=author,
+                image=ContentFile(buffer.getvalue(), name='photo.png'),
+            )
+            thumbnails.generate(post.image)
+            self.names.append(post.image.name)
+        thumbnails.clear_local()
+
+    def test_page_resolves_in_one_query(self):
+        """Миниатюры десяти картинок — один запрос, без sorl-thumbnail"""
+        with mock.patch.object(thumbnails, 'get_thumbnail') as sorl:
+            with self.assertNumQueries(1):
+                resolved = thumbnails.resolve(self.names)
+            with self.assertNumQueries(0):
+                thumbnails.resolve(self.names)
+        sorl.assert_not_called()
+        self.assertEqual(set(resolved), set(self.names))
+        urls = [url for _, url in resolved[self.names[0]]['JPEG']]
+        self.assertEqual(len(urls), len(thumbnails.WIDTHS))
+        self.assertTrue(all(url.startswith('/media/cache/') for url in urls))
+
+    def test_missing_row_is_built(self):
+        ImageVariants.objects.filter(source=self.names[0]).delete()
+        thumbnails.resolve(self.names)
+        self.assertTrue(
+            ImageVariants.objects.filter(source=self.names[0]).exists()
+        )
+
+    def test_feed_prefetches_images(self):
+        """Лента берёт миниатюры всех постов одним запросом"""
+        with mock.patch.object(
+            thumbnails, 'resolve', wraps=thumbnails.resolve
+        ) as resolve:
+            content = Client().get(reverse('posts:index')).content.decode()
+        resolve.assert_called_once()
+        self.assertEqual(content.count('<picture>'), 10)
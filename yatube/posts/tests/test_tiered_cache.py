@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from core import tiered_cache
+from core.tiered_cache import TieredCache
+
+OPTIONS = {
+    'SHARED': 'shared',
+    'MAX_ENTRIES': 3,
+    'MAX_BYTES': 1024,
+    'LOCAL_TIMEOUT': 30,
+    'SYNC_INTERVAL': 0,
+    'SHARED_PREFIXES': ('version:',),
+}
+
+
+def make_cache(name, **options):
+    return TieredCache(name, {'OPTIONS': {**OPTIONS, **options}})
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        tiered_cache._stores.clear()
+        # Два «процесса» со своими локальными уровнями над общим кэшем.
+        self.first = make_cache('first')
+        self.second = make_cache('second')
+
+    def test_value_is_read_from_local_tier(self):
+        """Повторное чтение не обращается к общему кэшу"""
+        self.first.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(self.first.get('key'), 'value')
+
+    def test_value_is_shared_between_processes(self):
+        """Запись одного процесса видна другому и оседает у него локально"""
+        self.first.set('key', {'value': 1})
+        self.assertEqual(self.second.get('key'), {'value': 1})
+        self.assertIsNotNone(self.second._local.get(self.second.make_key(
+            'key'
+        )))
+
+    def test_local_copy_is_not_mutated(self):
+        """Изменение полученного объекта не портит локальную копию"""
+        self.first.set('key', ['value'])
+        self.first.get('key').append('other')
+        self.assertEqual(self.first.get('key'), ['value'])
+
+    def test_lru_eviction_by_entries(self):
+        """При переполнении вытесняется давно не читанный ключ"""
+        for key in ('a', 'b', 'c'):
+            self.first.set(key, key)
+        self.first.get('a')
+        self.first.set('d', 'd')
+        local = self.first._local
+        self.assertIsNone(local.get(self.first.make_key('b')))
+        self.assertIsNotNone(local.get(self.first.make_key('a')))
+        self.assertEqual(self.first.get('b'), 'b')
+
+    def test_byte_limit(self):
+        """Объём локального уровня не превышает MAX_BYTES"""
+        self.first.set('small', 'x')
+        self.first.set('big', 'x' * 2048)
+        local = self.first._local
+        self.assertIsNone(local.get(self.first.make_key('big')))
+        self.assertLessEqual(local.size, OPTIONS['MAX_BYTES'])
+        self.assertEqual(self.first.get('big'), 'x' * 2048)
+
+    def test_local_ttl(self):
+        """Локальная копия живёт не дольше LOCAL_TIMEOUT"""
+        self.first.set('key', 'old')
+        caches['shared'].set('key', 'new')
+        self.assertEqual(self.first.get('key'), 'old')
+        now = tiered_cache.time.time()
+        with mock.patch.object(tiered_cache.time, 'time',
+                               return_value=now + 31):
+            self.assertEqual(self.first.get('key'), 'new')
+
+    def test_shared_prefixes_bypass_local_tier(self):
+        """Счётчики версий всегда читаются из общего кэша"""
+        self.first.set('version:feed', 1)
+        self.assertEqual(self.second.get('version:feed'), 1)
+        self.first.incr('version:feed')
+        self.assertEqual(self.second.get('version:feed'), 2)
+        self.assertEqual(len(self.second._local.entries), 0)
+
+    def test_clear_propagates_to_other_processes(self):
+        """После clear() в одном процессе другие сбрасывают свой LRU"""
+        self.second.get('missing')
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_delete(self):
+        """delete убирает ключ из обоих уровней"""
+        self.first.set('key', 'value')
+        self.first.delete('key')
+        self.assertIsNone(self.first.get('key'))
+        self.assertIsNone(caches['shared'].get('key'))
+
+    def test_add(self):
+        """add не перезаписывает существующий в общем кэше ключ"""
+        self.assertTrue(self.first.add('key', 'first'))
+        self.assertFalse(self.second.add('key', 'second'))
+        self.assertEqual(self.second.get('key'), 'first')
@@ -0,0 +1,134 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            text='Старый пост',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self):
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит в ленту уже опубликованные посты"""
+        self.follow()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=self.old_post
+            ).exists()
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_entry_keeps_post_date(self):
+        self.follow()
+        entry = TimelineEntry.objects.get(user=self.reader)
+        self.assertEqual(entry.pub_date, self.old_post.pub_date)
+
+    def test_feed_cursor_pages(self):
+        """Курсор ленты идёт по дате записи ленты"""
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(12)
+        ]
+        self.follow()
+        response = self.client.get(reverse('posts:follow_index'))
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(
+            reverse('posts:follow_index'), {'cursor': cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [posts[1], posts[0],
+                                                 self.old_post]
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков"""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        self.follow()
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_large_author_is_read_on_demand(self):
+        """Посты крупного автора не раскладываются, но видны в ленте"""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты с нуля"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=1)
+class PullToPushTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.first = User.objects.create_user(username='first')
+        self.second = User.objects.create_user(username='second')
+
+    def test_posts_from_pull_period_are_backfilled(self):
+        """
+        Когда автор снова ниже порога, его посты раскладываются и тем,
+        кто подписался, пока он был крупным
+        """
+        Follow.objects.create(user=self.first, author=self.author)
+        Follow.objects.create(user=self.second, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=self.first).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.second, post=post).exists()
+        )
+        client = Client()
+        client.force_login(self.second)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import view_counts
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ViewCountsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        view_counts._take()
+        cache.clear()
+
+    def views(self, post):
+        return Post.objects.values_list('views_count', flat=True).get(
+            pk=post.pk
+        )
+
+    def test_post_detail_is_counted(self):
+        """Просмотр страницы поста увеличивает счётчик"""
+        url = reverse('posts:post_detail', args=[self.posts[0].id])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.views(self.posts[0]), 0)
+        self.assertEqual(view_counts.flush(), 1)
+        self.assertEqual(self.views(self.posts[0]), 2)
+        self.assertContains(self.client.get(url), 'Просмотров: ')
+
+    def test_missing_post_is_not_counted(self):
+        self.client.get(reverse('posts:post_detail', args=[0]))
+        self.assertEqual(view_counts.flush(), 0)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_cached_page_is_counted(self):
+        """Страница из кэша тоже считается просмотром"""
+        url = reverse('posts:post_detail', args=[self.posts[0].id])
+        self.client.get(url)
+        self.client.get(url)
+        view_counts.flush()
+        self.assertEqual(self.views(self.posts[0]), 2)
+
+    def test_views_are_buffered_and_flushed_in_batches(self):
+        """Просмотры копятся в памяти и пишутся пачками UPDATE ... CASE"""
+        for post, views in zip(self.posts, (1, 2, 3)):
+            for _ in range(views):
+                view_counts.record(post.id)
+        self.assertEqual(self.views(self.posts[2]), 0)
+        with mock.patch.object(view_counts, 'VIEW_COUNTS_BATCH_SIZE', 2):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(view_counts.flush(), 3)
+        statements = [query['sql'].split()[0] for query in queries]
+        # На пачку — своя транзакция: точка отсчёта рейтингов и UPDATE.
+        self.assertEqual(
+            statements,
+            ['SAVEPOINT', 'SELECT', 'UPDATE', 'RELEASE'] * 2,
+        )
+        self.assertEqual(
+            [self.views(post) for post in self.posts], [1, 2, 3]
+        )
+
+    def test_failed_flush_keeps_views(self):
+        """Если запись не удалась, просмотры остаются в буфере"""
+        view_counts.record(self.posts[0].id)
+        with mock.patch('django.db.models.query.QuerySet.update',
+                        side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                view_counts.flush()
+        self.assertEqual(self.views(self.posts[0]), 0)
+        view_counts.flush()
+        self.assertEqual(self.views(self.posts[0]), 1)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=60)
+    @mock.patch.object(view_counts, '_ensure_flusher')
+    def test_full_buffer_wakes_flusher(self, ensure_flusher):
+        """Переполненный буфер будит фоновый поток раньше срока"""
+        with override_settings(VIEW_COUNTS_MAX_PENDING=2):
+            view_counts.record(self.posts[0].id)
+            self.assertFalse(view_counts._wakeup.is_set())
+            view_counts.record(self.posts[1].id)
+        self.assertTrue(view_counts._wakeup.is_set())
+        ensure_flusher.assert_called()
+        view_counts._wakeup.clear()
@@ -5,7 +5,9 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Follow, Group, Post
@@ -202,6 +204,68 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 3)
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Post.objects.bulk_create([
+            Post(text=str(i), author=cls.user) for i in range(1, 26)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        """Курсоры next проходят всю ленту без пропусков и повторов"""
+        url = reverse('posts:index')
+        seen = []
+        cursor = ''
+        while True:
+            response = self.guest_client.get(url, {'cursor': cursor})
+            page_obj = response.context['page_obj']
+            seen.extend(post.id for post in page_obj)
+            if not page_obj.has_next():
+                break
+            cursor = page_obj.next_cursor
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_to_previous_page(self):
+        """Курсор previous возвращает ровно предыдущую страницу"""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        second = self.guest_client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        back = self.guest_client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор не ломает страницу"""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'garbage'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_page_has_no_count_query(self):
+        """Курсорная страница не считает COUNT(*)"""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {'cursor': first.next_cursor})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+
 class FollowTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,164 @@
+"""
+Лента подписок с раскладкой при записи (fan-out-on-write).
+
+Пост обычного автора при публикации копируется в TimelineEntry
+каждого подписчика вместе с датой публикации, и лента читается одним
+проходом по индексу (user, -pub_date, -post). Посты авторов, у которых
+подписчиков больше TIMELINE_FANOUT_LIMIT, не раскладываются, а
+дочитываются при открытии ленты (fan-out-on-read). Когда автор
+опускается ниже порога, его посты раскладываются по лентам всех
+подписчиков фоновой задачей (backfill_author).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from tasks.queue import task
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 400
+# Ключ сортировки ленты — аннотации feed(): для разложенных постов это
+# колонки TimelineEntry, поэтому сортировка и курсор идут по её индексу.
+ORDERING = ('-feed_date', '-feed_post')
+PULL_AUTHORS_KEY = 'timeline:pull-authors'
+PULL_AUTHORS_TIMEOUT = 60 * 60
+
+
+def fanout_limit():
+    return settings.TIMELINE_FANOUT_LIMIT
+
+
+def pull_authors():
+    """Id авторов, чьи посты дочитываются при чтении ленты."""
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(
+            Follow.objects.values('author')
+            .annotate(followers=Count('id'))
+            .filter(followers__gt=fanout_limit())
+            .values_list('author', flat=True)
+        )
+        cache.set(PULL_AUTHORS_KEY, authors, PULL_AUTHORS_TIMEOUT)
+    return authors
+
+
+def reset_pull_authors():
+    cache.delete(PULL_AUTHORS_KEY)
+
+
+def followers_changed(author_id):
+    """
+    Сбрасывает список крупных авторов, если автор пересёк порог. Посты,
+    опубликованные, пока автор был крупным, в ленты не попали — при
+    возврате ниже порога они раскладываются задачей backfill_author.
+    """
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+    is_pull = followers > fanout_limit()
+    was_pull = author_id in pull_authors()
+    if is_pull != was_pull:
+        reset_pull_authors()
+        if was_pull:
+            backfill_author.delay(author_id)
+
+
+def _insert(rows):
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id, post_id, pub_date in rows],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in pull_authors():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        (user_id, post.id, post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if author_id in pull_authors():
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    _insert(
+        (user_id, post_id, pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+@task()
+def backfill_author(author_id):
+    """
+    Раскладывает все посты автора по лентам всех его подписчиков.
+    Уже разложенные пропускаются, так что задачу можно повторять.
+    """
+    if author_id in pull_authors():
+        # Пока задача ждала очереди, автор снова стал крупным.
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        # Транзакция на подписчика: вставки одной ленты — один commit.
+        with transaction.atomic():
+            backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя с нуля по его подпискам."""
+    # Одна транзакция на ленту: иначе каждая вставка — отдельный commit.
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        authors = Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True)
+        for author_id in authors:
+            backfill(user_id, author_id)
+
+
+def feed(user):
+    """
+    Посты ленты подписок пользователя, отсортированные по ORDERING.
+    Если крупных авторов среди подписок нет, лента — один проход по
+    индексу TimelineEntry; иначе посты берутся из ленты и постов
+    крупных авторов и сортируются по дате поста.
+    """
+    authors = pull_authors()
+    pulled = []
+    if authors:
+        pulled = list(
+            Follow.objects.filter(user=user, author_id__in=authors)
+            .values_list('author_id', flat=True)
+        )
+    if not pulled:
+        posts = Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post'),
+        )
+    else:
+        entries = TimelineEntry.objects.filter(user=user).values('post_id')
+        posts = Post.objects.filter(
+            Q(id__in=entries) | Q(author_id__in=pulled)
+        ).annotate(feed_date=F('pub_date'), feed_post=F('id'))
+    return posts.order_by(*ORDERING)
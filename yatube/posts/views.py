@@ -1,75 +1,188 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 
+from core.db_router import replica_reads
+from core.page_cache import cached_page
+from core.query_budget import query_budget
+
+from . import (conditional, counters, feed_cache, images, ranking,
+               timeline)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .paginators import (COMMENTS_PER_PAGE, POSTS_PER_PAGE, CursorPaginator,
+                         paginate)
+from .search import search_posts
+from .view_counts import count_views
 
 
+@replica_reads
 @require_http_methods(["GET"])
+@cached_page(shared=True)
+@query_budget(6)
+@condition(
+    etag_func=conditional.index_etag,
+    last_modified_func=conditional.index_last_modified,
+)
 def index(request):
-    posts_qs = Post.objects.all()
-    paginator = Paginator(posts_qs, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts_qs = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, posts_qs)
     context = {
         'page_obj': page_obj,
+        'feed_cache': feed_cache.for_feed(feed_cache.INDEX),
     }
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
 @require_http_methods(["GET"])
+@cached_page(shared=True)
+@query_budget(5)
+@condition(
+    etag_func=conditional.group_etag,
+    last_modified_func=conditional.group_last_modified,
+)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author')
+    page_obj = paginate(request, posts)
 
     template = 'posts/group_list.html'
     context = {
         'group': group,
         'posts': posts,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'feed_cache': feed_cache.for_feed(
+            feed_cache.group_namespace(group.id)
+        ),
     }
     return render(request, template, context)
 
 
+@replica_reads
 @require_http_methods(["GET"])
+@cached_page()
+@query_budget(7)
+@condition(
+    etag_func=conditional.profile_etag,
+    last_modified_func=conditional.profile_last_modified,
+)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = author.posts.select_related('group')
+    author_stats = counters.stats_for(author.id)
+    page_obj = paginate(request, posts, estimate=author_stats.posts_count)
     following = False
     if request.user.is_authenticated:
         user = request.user
         following = Follow.objects.filter(user=user, author=author).exists()
     context = {
         'author': author,
+        'author_stats': author_stats,
         'page_obj': page_obj,
         'following': following,
+        'feed_cache': feed_cache.for_feed(
+            feed_cache.profile_namespace(author.id)
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_page(post_id, cursor=None):
+    """
+    Страница комментариев поста по курсору на (created, id): страница
+    поста рендерится одинаково быстро при любом их числе.
+    """
+    return CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+    ).get_page(cursor)
+
+
+@replica_reads
 @require_http_methods(["GET"])
+@count_views('post_id')
+@cached_page()
+@query_budget(6)
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    user = post.author
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'user': user,
+        'author_stats': counters.stats_for(post.author_id),
         'form': form,
-        'comments': post.comments,
+        'comments_page': comments_page(post.id, request.GET.get('cursor')),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@require_http_methods(["GET"])
+@cached_page(shared=True)
+@query_budget(4)
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML для подгрузки."""
+    if not conditional.post_exists(request, post_id):
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments_page': comments_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def ranked_feed(request, name, title):
+    """Лента по рейтингу: та же выборка по индексу, что и у главной."""
+    paginator = CursorPaginator(
+        Post.objects.select_related('author', 'group'),
+        POSTS_PER_PAGE,
+        ordering=ranking.ordering(name),
+    )
+    context = {
+        'title': title,
+        'page_obj': paginator.get_page(request.GET.get('cursor')),
+    }
+    return render(request, 'posts/ranked.html', context)
+
+
+@require_http_methods(["GET"])
+@cached_page(shared=True)
+@query_budget(3)
+def popular(request):
+    return ranked_feed(request, ranking.POPULAR, 'Популярное')
+
+
+@require_http_methods(["GET"])
+@cached_page(shared=True)
+@query_budget(3)
+def trending(request):
+    return ranked_feed(request, ranking.TRENDING, 'В тренде')
+
+
+@require_http_methods(["GET"])
+@cached_page(shared=True)
+@query_budget(4)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': search_posts(query, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @require_http_methods(["GET", "POST"])
 @login_required
 def post_create(request):
@@ -78,7 +191,9 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
+            images.schedule(post)
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', context)
 
@@ -95,7 +210,13 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        post.save()
+        if 'image' in form.changed_data:
+            # Размеры новой картинки запишет её приём.
+            post.image_width = post.image_height = None
+        with transaction.atomic():
+            post.save()
+            if 'image' in form.changed_data:
+                images.schedule(post)
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'is_edit': True, 'post': post}
     return render(request, 'posts/create_post.html', context)
@@ -110,16 +231,17 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
+@query_budget(6)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = timeline.feed(request.user).select_related('author', 'group')
+    page_obj = paginate(request, posts, ordering=timeline.ORDERING)
     context = {
         'page_obj': page_obj,
     }
@@ -138,5 +260,6 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     if request.user.username != username:
         author = get_object_or_404(User, username=username)
-        Follow.objects.filter(user=request.user, author=author).delete()
+        with transaction.atomic():
+            Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:follow_index')
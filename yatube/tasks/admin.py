@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'created',
+    )
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error',)
+
+
+admin.site.register(Job, JobAdmin)
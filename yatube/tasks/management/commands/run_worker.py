@@ -0,0 +1,85 @@
+import logging
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from tasks import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди в нескольких потоках. '
+        'Работает до SIGINT/SIGTERM, с --once — пока очередь не опустеет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='Сколько задач выполнять одновременно.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза между проверками пустой очереди.')
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда готовых задач не останется.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency должен быть больше нуля')
+        self.stop = threading.Event()
+        self.done = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+        if not options['once']:
+            signal.signal(signal.SIGINT, self.shutdown)
+            signal.signal(signal.SIGTERM, self.shutdown)
+        workers = [
+            threading.Thread(
+                target=self.work,
+                args=(options['poll_interval'], options['once']),
+                name=f'worker-{number}',
+            )
+            for number in range(options['concurrency'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {self.done}, с ошибкой: {self.failed}'
+        ))
+
+    def shutdown(self, signum, frame):
+        # Начатые задачи доделываются, новые не берутся.
+        self.stop.set()
+
+    def work(self, poll_interval, once):
+        try:
+            self.loop(poll_interval, once)
+        finally:
+            # Соединения потока закрываются вместе с ним.
+            connections.close_all()
+
+    def loop(self, poll_interval, once):
+        while not self.stop.is_set():
+            try:
+                job = queue.claim()
+                succeeded = job is not None and queue.run(job)
+            except Exception:
+                # Например, база занята: задача вернётся в очередь по
+                # истечении TASKS_VISIBILITY_TIMEOUT.
+                logger.exception('Worker iteration failed')
+                job = succeeded = None
+            finally:
+                close_old_connections()
+            if job is None:
+                if once and succeeded is not None:
+                    return
+                self.stop.wait(poll_interval)
+                continue
+            with self.lock:
+                if succeeded:
+                    self.done += 1
+                else:
+                    self.failed += 1
@@ -0,0 +1,168 @@
+"""
+Очередь фоновых задач в таблице Job.
+
+Функция помечается декоратором @task(), а вызов func.delay(*args)
+вместо выполнения пишет строку в Job в текущей транзакции: задача
+появится в очереди, только если транзакция запроса закоммитится.
+Аргументы хранятся в JSON, поэтому передавать нужно простые значения
+(id, имена файлов, строки), а не объекты моделей.
+
+Задачи выполняет management-команда run_worker. Воркер забирает задачу
+условным UPDATE (только если её никто не успел забрать) и держит её не
+дольше TASKS_VISIBILITY_TIMEOUT: если воркер упал, по истечении этого
+времени задачу заберёт другой. Поэтому задача может выполниться больше
+одного раза и должна быть идемпотентной. Упавшая задача повторяется с
+экспоненциально растущей паузой, после TASKS_MAX_ATTEMPTS попыток
+остаётся в таблице со статусом failed и текстом ошибки.
+
+При TASKS_EAGER = True (в тестах) очереди нет: задача выполняется
+сразу после коммита транзакции.
+"""
+import json
+import logging
+import random
+import traceback
+from datetime import timedelta
+from functools import update_wrapper
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Сколько кандидатов перебирает воркер, пока не заберёт одну задачу:
+# остальных могли забрать другие воркеры.
+CLAIM_CANDIDATES = 10
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Ставит вызов в очередь; возвращает Job или None в режиме eager."""
+        payload = json.dumps(
+            {'args': args, 'kwargs': kwargs}, cls=DjangoJSONEncoder
+        )
+        if settings.TASKS_EAGER:
+            # Аргументы проходят через JSON и здесь, чтобы в тестах
+            # ловились те же ошибки, что и с настоящей очередью.
+            data = json.loads(payload)
+            transaction.on_commit(
+                lambda: self.func(*data['args'], **data['kwargs'])
+            )
+            return None
+        return Job.objects.create(
+            name=self.name,
+            payload=payload,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now(),
+        )
+
+
+def task(max_attempts=None):
+    """Делает функцию фоновой задачей с методом delay()."""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        _registry[name] = Task(
+            func, name, max_attempts or settings.TASKS_MAX_ATTEMPTS
+        )
+        return _registry[name]
+    return decorator
+
+
+def get_task(name):
+    if name not in _registry:
+        # Модуль задачи ещё не импортирован в этом процессе воркера.
+        import_string(name)
+    return _registry[name]
+
+
+def backoff(attempts):
+    """Пауза перед следующей попыткой: растёт вдвое, с разбросом."""
+    delay = min(
+        settings.TASKS_RETRY_BASE * 2 ** (attempts - 1),
+        settings.TASKS_RETRY_MAX,
+    )
+    return timedelta(seconds=delay * random.uniform(0.75, 1.25))
+
+
+def _available(now):
+    return (
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim():
+    """Забирает одну готовую к выполнению задачу или возвращает None."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(_available(now))
+        .order_by('run_at', 'id')
+        .values_list('pk', flat=True)[:CLAIM_CANDIDATES]
+    )
+    locked_until = now + timedelta(seconds=settings.TASKS_VISIBILITY_TIMEOUT)
+    for pk in candidates:
+        claimed = Job.objects.filter(_available(now), pk=pk).update(
+            status=Job.RUNNING,
+            locked_until=locked_until,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """Выполняет забранную задачу; True, если она завершилась успешно."""
+    # Условие по attempts: если задачу уже перехватил другой воркер,
+    # её строку не трогаем.
+    own = Job.objects.filter(pk=job.pk, attempts=job.attempts)
+    try:
+        if job.attempts > job.max_attempts:
+            raise RuntimeError('Visibility timeout expired too many times')
+        data = json.loads(job.payload)
+        get_task(job.name).func(*data['args'], **data['kwargs'])
+    except Exception:
+        logger.exception('Job %s failed (attempt %s)', job, job.attempts)
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            own.update(status=Job.FAILED, locked_until=None,
+                       last_error=error)
+        else:
+            own.update(
+                status=Job.QUEUED,
+                locked_until=None,
+                run_at=timezone.now() + backoff(job.attempts),
+                last_error=error,
+            )
+        return False
+    own.delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи, пока они есть; возвращает их число."""
+    done = 0
+    while limit is None or done < limit:
+        job = claim()
+        if job is None:
+            break
+        run(job)
+        done += 1
+    return done
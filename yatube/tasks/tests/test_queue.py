@@ -0,0 +1,134 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks import queue
+from tasks.models import Job
+
+User = get_user_model()
+
+calls = []
+
+
+@queue.task(max_attempts=2)
+def remember(value, twice=False):
+    calls.append(value)
+    if twice:
+        calls.append(value)
+
+
+@queue.task(max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(TASKS_EAGER=False)
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_enqueues_job(self):
+        """delay() пишет задачу в таблицу, а не выполняет её"""
+        job = remember.delay('a', twice=True)
+        self.assertEqual(calls, [])
+        self.assertEqual(job.name, 'tasks.tests.test_queue.remember')
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(calls, ['a', 'a'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_future_job_waits(self):
+        job = remember.delay('a')
+        Job.objects.filter(pk=job.pk).update(
+            run_at=timezone.now() + timedelta(minutes=1)
+        )
+        self.assertEqual(queue.run_pending(), 0)
+
+    def test_claimed_job_is_invisible(self):
+        """Забранную задачу другой воркер не получит до таймаута"""
+        remember.delay('a')
+        job = queue.claim()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(queue.claim())
+
+    def test_expired_lock_is_reclaimed(self):
+        """Задача упавшего воркера возвращается после таймаута"""
+        remember.delay('a')
+        job = queue.claim()
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        reclaimed = queue.claim()
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        # Опоздавший первый воркер не трогает перехваченную задачу.
+        queue.run(job)
+        self.assertTrue(Job.objects.filter(pk=job.pk).exists())
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Упавшая задача откладывается, потом помечается failed"""
+        job = explode.delay()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(queue.run(queue.claim()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            queue.run(queue.claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(queue.claim())
+
+    def test_backoff_grows(self):
+        with mock.patch.object(queue.random, 'uniform', return_value=1):
+            delays = [queue.backoff(n).total_seconds() for n in (1, 2, 3)]
+        self.assertEqual(delays, [10, 20, 40])
+        with mock.patch.object(queue.random, 'uniform', return_value=1):
+            self.assertEqual(queue.backoff(50).total_seconds(), 3600)
+
+    def test_password_reset_email_is_queued(self):
+        """Письмо сброса пароля уходит из воркера, а не из запроса"""
+        User.objects.create_user(
+            username='user', email='user@example.com', password='secret'
+        )
+        response = Client().post(
+            reverse('users:password_reset_form'),
+            {'email': 'user@example.com'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        # В задаче, которую видно в админке, нет ни ссылки, ни токена.
+        payload = Job.objects.get().payload
+        self.assertNotIn('/auth/reset/', payload)
+        self.assertNotIn('user@example.com', payload)
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+        self.assertIn('/auth/reset/', mail.outbox[0].body)
+
+
+@override_settings(TASKS_EAGER=False)
+class RunWorkerTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_drains_queue(self):
+        """run_worker --once выполняет все готовые задачи в потоках"""
+        for value in range(5):
+            remember.delay(value)
+        explode.delay()
+        out = io.StringIO()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            call_command('run_worker', concurrency=3, once=True, stdout=out)
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertIn('Выполнено задач: 5, с ошибкой: 1', out.getvalue())
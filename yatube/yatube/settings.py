@@ -39,7 +39,8 @@ INSTALLED_APPS = [
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
-    'posts',
+    'posts.apps.PostsConfig',
+    'tasks.apps.TasksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,6 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.view_counts.ViewCountMiddleware',
+    'core.db_router.ReplicaMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
+    'core.page_cache.PageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,11 +92,49 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite, чьи транзакции начинаются с BEGIN IMMEDIATE.
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переживает запрос: PRAGMA из SQLITE_PRAGMAS
+        # выполняются раз в минуту, а не на каждый запрос.
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# PRAGMA каждого нового соединения SQLite (core.sqlite): WAL, чтобы
+# чтение не ждало записи; fsync только на checkpoint; ожидание занятой
+# базы вместо «database is locked»; чтение файла через mmap; 32 МБ
+# кэша страниц на соединение; временные таблицы в памяти.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+    'temp_store': 'memory',
+}
+
+# Реплики только для чтения (core.db_router): на них идут GET-запросы
+# view, помеченных @replica_reads. Для локальной проверки
+# YATUBE_REPLICAS=2 добавляет копии db.replica1.sqlite3, ...,
+# которые обновляет manage.py sync_replicas.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Сколько секунд после POST-запроса чтения посетителя идут в основную
+# базу: реплики должны отставать меньше.
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -145,8 +188,92 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш двухуровневый (core.tiered_cache): LRU в памяти каждого воркера
+# поверх общего для всех воркеров файлового кэша. Счётчики версий лент
+# и страниц всегда читаются из общего кэша, чтобы инвалидация в одном
+# процессе сразу была видна остальным.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.tiered_cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 1000,
+            'MAX_BYTES': 32 * 1024 * 1024,
+            'LOCAL_TIMEOUT': 30,
+            'SYNC_INTERVAL': 1,
+            'SHARED_PREFIXES': (
+                'feed-version:', 'feed-modified:', 'page-cache-version',
+                'timeline:',
+            ),
+        },
+    },
+    # По умолчанию у FileBasedCache MAX_ENTRIES = 300, и дальше каждый
+    # set удалял бы треть случайных файлов, в том числе страницы и
+    # версии лент. Каждый set перечисляет каталог, поэтому предел не
+    # бесконечный; при вытеснении удаляется десятая часть записей.
+    # Вытесненная версия ленты заменяется новой (new_version), и старые
+    # фрагменты просто перестают читаться.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
 }
+
+# Авторы, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков при публикации: их посты дочитываются при
+# открытии ленты.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Сколько живут закэшированные страницы лент. Новые посты видны сразу:
+# сигналы Post меняют версию ленты, и старые ключи больше не читаются.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Превышение бюджета запросов у view (core.query_budget): в обычном
+# режиме пишется в лог, в строгом (в тестах) — падает с исключением.
+QUERY_BUDGET_STRICT = False
+
+# Настройки для тестов — в yatube/settings_test.py: с ними фоновая
+# работа выполняется сразу, а кэши и реплики не мешают тестам.
+
+# Очередь фоновых задач (tasks.queue): миниатюры, письма. Задачи
+# выполняет manage.py run_worker; при TASKS_EAGER очереди нет, и задача
+# выполняется сразу после коммита транзакции.
+TASKS_EAGER = False
+TASKS_MAX_ATTEMPTS = 5
+# Сколько секунд задача числится за воркером; если он упал, потом её
+# заберёт другой.
+TASKS_VISIBILITY_TIMEOUT = 60 * 5
+# Пауза перед повтором: 10 с, 20 с, 40 с... но не больше часа.
+TASKS_RETRY_BASE = 10
+TASKS_RETRY_MAX = 60 * 60
+
+# Кэш целых страниц (core.page_cache).
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Просмотры постов (posts.view_counts) копятся в памяти процесса и
+# пишутся в БД пачками раз в VIEW_COUNTS_FLUSH_INTERVAL секунд или
+# раньше, когда в буфере VIEW_COUNTS_MAX_PENDING постов. При падении
+# процесса теряется не больше одного интервала. При None фонового
+# потока нет, и flush() вызывается явно.
+VIEW_COUNTS_FLUSH_INTERVAL = 10
+VIEW_COUNTS_MAX_PENDING = 1000
+
+# Нумерованная пагинация (?page=N, posts.paginators.ApproximatePaginator)
+# на выборках от этого размера берёт число записей из счётчиков, оценки
+# размера таблицы или кэша, а не из COUNT(*).
+PAGINATOR_EXACT_COUNT_LIMIT = 10000
+PAGINATOR_COUNT_TIMEOUT = 60 * 5
+
+# Приём картинок постов (posts.images): оригинал уменьшается до
+# IMAGE_MAX_SIZE по большей стороне и перекодируется в JPEG; картинки
+# больше IMAGE_MAX_PIXELS форма не принимает. Перекодирование идёт в
+# пуле из IMAGE_PROCESSES процессов, при 0 — в текущем потоке.
+IMAGE_MAX_SIZE = 2048
+IMAGE_QUALITY = 82
+IMAGE_MAX_PIXELS = 8000 * 8000
+IMAGE_PROCESSES = 2
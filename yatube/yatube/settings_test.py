@@ -0,0 +1,41 @@
+"""
+Настройки для тестов: manage.py test и pytest (pytest.ini).
+
+Фоновая работа выполняется сразу, а не в пулах и фоновых потоках:
+иначе она гоняется с откатом тестовой БД и временными каталогами.
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401, F403
+from .settings import CACHES, DATABASES
+
+# Тестовая база — файл, а не память с общим кэшем: там параллельная
+# запись из потоков (воркер очереди, warm_thumbnails) падает с
+# «database table is locked» без ожидания busy_timeout. В имени pid,
+# чтобы одновременные прогоны не делили файл.
+DATABASES['default']['TEST'] = {
+    'NAME': os.path.join(
+        tempfile.gettempdir(), f'yatube-test-{os.getpid()}.sqlite3'
+    ),
+}
+
+# Общий уровень кэша — в памяти, без файлов на диске.
+CACHES['shared'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+# Тестовые реплики — зеркала default; тесты, которым нужно чтение
+# с реплик, включают его через override_settings.
+DATABASE_REPLICAS = []
+
+# Задача выполняется сразу после коммита транзакции.
+TASKS_EAGER = True
+
+# Тесты проверяют response.context, которого у страницы из кэша нет.
+PAGE_CACHE_ENABLED = False
+
+# Фонового потока нет: тесты сами вызывают flush().
+VIEW_COUNTS_FLUSH_INTERVAL = None
+
+IMAGE_PROCESSES = 0